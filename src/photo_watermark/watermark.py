@@ -2,49 +2,138 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import io
+import logging
+import logging.handlers
+import multiprocessing
 import os
+import queue
+import re
+import uuid
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import BinaryIO, Iterator, Optional, Tuple, Union
 
-from PIL import Image, ImageDraw, ImageFont, ImageColor
+from PIL import Image, ImageDraw, ImageFont, ImageColor, TiffImagePlugin
+
+logger = logging.getLogger("photo_watermark")
 
 
 # --------- EXIF 拍摄时间提取 ----------
-def extract_exif_date(image_path: Path) -> Optional[str]:
+EXIF_DATE_TAGS = (36867, 36868, 306)  # DateTimeOriginal, DateTimeDigitized, DateTime
+EXIF_IFD_POINTER = 0x8769
+JPEG_HEAD_BYTES = 64 * 1024  # EXIF(APP1) 段位于 JPEG 文件开头，读取前 64KB 即可
+
+
+def _format_exif_date(dt_raw: str) -> str:
+    dt_raw = dt_raw.strip().replace('-', ':')
+    dt = datetime.strptime(dt_raw.split(' ')[0], "%Y:%m:%d")
+    return dt.strftime("%Y-%m-%d")
+
+
+def _fast_jpeg_exif_date(src: Union[Path, BinaryIO]) -> Optional[str]:
+    """只读取 JPEG 文件头部的 APP1 段解析拍摄日期；非 JPEG 或解析失败时返回 None。"""
+    if hasattr(src, "read"):
+        head = src.read(JPEG_HEAD_BYTES)
+        src.seek(0)
+    else:
+        with open(src, "rb") as f:
+            head = f.read(JPEG_HEAD_BYTES)
+    if head[:2] != b"\xff\xd8":
+        return None
+
+    pos = 2
+    while pos + 4 <= len(head):
+        if head[pos] != 0xFF:
+            return None
+        marker = head[pos + 1]
+        if marker == 0xFF:  # 填充字节
+            pos += 1
+            continue
+        if marker in (0xD9, 0xDA):  # EOI / SOS：之后不会再有 EXIF
+            return None
+        seg_len = int.from_bytes(head[pos + 2:pos + 4], "big")
+        if marker == 0xE1 and head[pos + 4:pos + 10] == b"Exif\x00\x00":
+            tiff = head[pos + 10:pos + 2 + seg_len]
+            if len(tiff) < seg_len - 8:  # APP1 段被截断
+                return None
+            return _tiff_exif_date(tiff)
+        pos += 2 + seg_len
+    return None
+
+
+def _tiff_exif_date(tiff: bytes) -> Optional[str]:
+    fp = io.BytesIO(tiff)
+    ifh = fp.read(8)
+    ifd0 = TiffImagePlugin.ImageFileDirectory_v2(ifh)
+    fp.seek(ifd0.next)
+    ifd0.load(fp)
+    tags = dict(ifd0)
+    # DateTimeOriginal / DateTimeDigitized 位于 Exif 子 IFD 中
+    sub_offset = ifd0.get(EXIF_IFD_POINTER)
+    if sub_offset:
+        sub = TiffImagePlugin.ImageFileDirectory_v2(ifh)
+        fp.seek(sub_offset)
+        sub.load(fp)
+        tags.update(sub)
+    for tag in EXIF_DATE_TAGS:
+        val = tags.get(tag)
+        if val:
+            return _format_exif_date(str(val))
+    return None
+
+
+def extract_exif_date(src: Union[Path, BinaryIO]) -> Optional[str]:
+    # src 可以是文件路径，也可以是已读入内存的文件对象（与像素解码共用同一份数据）
+    # 快速路径：JPEG 只解析 APP1 段，不走完整的 Image.open
     try:
-        with Image.open(image_path) as im:
+        dt = _fast_jpeg_exif_date(src)
+        if dt:
+            return dt
+    except Exception:
+        pass
+
+    try:
+        if hasattr(src, "seek"):
+            src.seek(0)
+        with Image.open(src) as im:
             exif = im.getexif()
             if not exif:
                 return None
-            candidates = [36867, 36868, 306]  # DateTimeOriginal, DateTimeDigitized, DateTime
             dt_raw = None
-            for tag in candidates:
+            for tag in EXIF_DATE_TAGS:
                 val = exif.get(tag)
                 if val:
                     dt_raw = str(val)
                     break
             if not dt_raw:
                 return None
-            dt_raw = dt_raw.strip().replace('-', ':')
-            dt = datetime.strptime(dt_raw.split(' ')[0], "%Y:%m:%d")
-            return dt.strftime("%Y-%m-%d")
+            return _format_exif_date(dt_raw)
     except Exception:
         return None
 
 
+_HEX_RE = re.compile(r"^#([0-9a-fA-F]{6})$")
+
+
 def parse_color(color_str: str) -> Tuple[int, int, int]:
+    # 快速路径：最常见的 #RRGGBB 直接解析，不经过 Pillow 的颜色名表
+    m = _HEX_RE.match(color_str)
+    if m:
+        h = m.group(1)
+        return tuple(int(h[i:i + 2], 16) for i in (0, 2, 4))
     try:
         rgb = ImageColor.getrgb(color_str)
-        if len(rgb) == 3:
-            return rgb
-        elif len(rgb) == 4:
-            return rgb[:3]
-    except Exception:
-        pass
-    raise ValueError(f"无法解析颜色：{color_str}")
+    except ValueError as e:
+        raise ValueError(f"无法解析颜色：{color_str}") from e
+    return rgb[:3]
 
 
+# 候选字体只需查找一次，结果在整个批次中复用
+@lru_cache(maxsize=1)
 def try_find_font() -> Optional[str]:
     candidates = [
         r"C:\Windows\Fonts\msyh.ttc",
@@ -61,6 +150,8 @@ def try_find_font() -> Optional[str]:
     return None
 
 
+# 同一批次中字体参数相同，缓存已加载的字体，避免每张图片重复解析字体文件
+@lru_cache(maxsize=32)
 def load_font(font_path: Optional[str], font_size: int) -> ImageFont.ImageFont:
     if font_path and Path(font_path).exists():
         return ImageFont.truetype(font_path, font_size)
@@ -70,6 +161,47 @@ def load_font(font_path: Optional[str], font_size: int) -> ImageFont.ImageFont:
     return ImageFont.load_default()
 
 
+_measure_draw: Optional[ImageDraw.ImageDraw] = None
+
+
+# 同一批次中水印文字大多相同（同一天拍摄的照片日期一致），缓存文字外接框
+@lru_cache(maxsize=256)
+def measure_text(text: str, font_path: Optional[str], font_size: int,
+                 stroke_width: int) -> Tuple[int, int, int, int]:
+    global _measure_draw
+    if _measure_draw is None:
+        _measure_draw = ImageDraw.Draw(Image.new("RGBA", (10, 10)))
+    font = load_font(font_path, font_size)
+    return _measure_draw.textbbox((0, 0), text, font=font, stroke_width=stroke_width)
+
+
+# 文字精灵图只与文字、字体与颜色有关，与底图尺寸无关，可在整个批次中复用
+@lru_cache(maxsize=32)
+def render_text_sprite(
+    text: str,
+    font_path: Optional[str],
+    font_size: int,
+    fill_rgba: Tuple[int, int, int, int],
+    stroke_width: int,
+    stroke_rgba: Tuple[int, int, int, int]
+) -> Image.Image:
+    """渲染紧贴文字外接框的 RGBA 水印图（返回值被缓存共享，调用方不得原地修改）"""
+    font = load_font(font_path, font_size)
+    bbox = measure_text(text, font_path, font_size, stroke_width)
+    text_w, text_h = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    sprite = Image.new("RGBA", (max(1, text_w), max(1, text_h)), (255, 255, 255, 0))
+    d = ImageDraw.Draw(sprite)
+    d.text(
+        (-bbox[0], -bbox[1]),
+        text,
+        font=font,
+        fill=fill_rgba,
+        stroke_width=stroke_width,
+        stroke_fill=stroke_rgba,
+    )
+    return sprite
+
+
 def compute_xy(img_w: int, img_h: int, text_w: int, text_h: int,
                position: str, margin: int) -> Tuple[int, int]:
     pos = position.lower()
@@ -87,162 +219,358 @@ def compute_xy(img_w: int, img_h: int, text_w: int, text_h: int,
 
 
 def draw_watermark(
-    image_path: Path,
+    src: Union[Path, BinaryIO],
     text: str,
     font_path: Optional[str],
     font_size: int,
-    color: Tuple[int, int, int],
-    opacity: int,
+    fill_rgba: Tuple[int, int, int, int],
     position: str,
     margin: int,
     stroke_width: int,
-    stroke_fill: Tuple[int, int, int],
-    auto_size_ratio: float = 0.0
+    stroke_rgba: Tuple[int, int, int, int],
+    auto_size_ratio: float = 0.0,
+    out_format: Optional[str] = None,
+    max_dim: int = 0
 ) -> Image.Image:
-    im = Image.open(image_path).convert("RGBA")
+    im = Image.open(src)
+    if max_dim > 0:
+        # JPEG 可在解码阶段按 1/2、1/4、1/8 缩小（DCT 缩放），比完整解码后再缩放快得多；
+        # 其它格式 draft 不生效，由 thumbnail 完成缩放
+        im.draft("RGB", (max_dim, max_dim))
+        im.thumbnail((max_dim, max_dim), Image.LANCZOS)
+    if out_format == "JPEG":
+        # JPEG 不保留透明通道：底图保持 RGB，只在水印区域局部转换为 RGBA 合成
+        if im.mode != "RGB":
+            im = im.convert("RGB")
+    else:
+        im = im.convert("RGBA")
     W, H = im.size
 
     # 如果设置了自动比例，则覆盖 font_size
     if auto_size_ratio and auto_size_ratio > 0:
         font_size = max(12, int(min(W, H) * float(auto_size_ratio)))
+        # 量化到 4 的倍数，使尺寸相近的照片能命中同一个字体缓存
+        font_size = max(12, (font_size + 2) // 4 * 4)
 
-    font = load_font(font_path, font_size)
-    dummy_img = Image.new("RGBA", (10, 10))
-    d0 = ImageDraw.Draw(dummy_img)
-    bbox = d0.textbbox((0, 0), text, font=font, stroke_width=stroke_width)
+    bbox = measure_text(text, font_path, font_size, stroke_width)
     text_w, text_h = bbox[2] - bbox[0], bbox[3] - bbox[1]
 
     x, y = compute_xy(W, H, text_w, text_h, position, margin)
 
-    txt_layer = Image.new("RGBA", im.size, (255, 255, 255, 0))
-    d = ImageDraw.Draw(txt_layer)
-    fill_rgba = (color[0], color[1], color[2], int(max(0, min(255, opacity))))
-    stroke_rgba = (stroke_fill[0], stroke_fill[1], stroke_fill[2], int(max(0, min(255, opacity))))
+    sprite = render_text_sprite(text, font_path, font_size, fill_rgba, stroke_width, stroke_rgba)
 
-    d.text(
-        (x, y),
-        text,
-        font=font,
-        fill=fill_rgba,
-        stroke_width=stroke_width,
-        stroke_fill=stroke_rgba,
-    )
-    out = Image.alpha_composite(im, txt_layer)
-    return out.convert("RGB")
+    # 仅对外接框与原图相交的区域做 alpha 合成
+    left, top = x + bbox[0], y + bbox[1]
+    box = (max(0, left), max(0, top), min(W, left + text_w), min(H, top + text_h))
+    if box[0] < box[2] and box[1] < box[3]:
+        layer = sprite.crop((box[0] - left, box[1] - top, box[2] - left, box[3] - top))
+        region = im.crop(box)
+        if region.mode == "RGBA":
+            blended = Image.alpha_composite(region, layer)
+        else:
+            blended = Image.alpha_composite(region.convert("RGBA"), layer).convert(region.mode)
+        im.paste(blended, box[:2])
+    return im if im.mode == "RGB" else im.convert("RGB")
+
+
+# 输出扩展名 → Pillow 保存格式（显式指定格式，省去按扩展名推断）
+OUTPUT_FORMATS = {
+    ".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG",
+    ".webp": "WEBP", ".bmp": "BMP", ".tiff": "TIFF",
+}
+
+
+SHARD_COUNT = 256
 
 
-def process_one(
+def shard_name(stem: str) -> str:
+    # 用稳定的 crc32 而非内置 hash（后者每个进程的随机种子不同）
+    return f"{zlib.crc32(stem.encode('utf-8')) & (SHARD_COUNT - 1):02x}"
+
+
+def render_one(
     image_path: Path,
-    out_root: Path, 
+    data: bytes,
+    out_root: Path,
     font_path: Optional[str],
     font_size: int,
-    color: Tuple[int, int, int],
-    opacity: int,
+    fill_rgba: Tuple[int, int, int, int],
     position: str,
     margin: int,
     stroke_width: int,
-    stroke_fill: Tuple[int, int, int],
+    stroke_rgba: Tuple[int, int, int, int],
     fallback_use_mtime: bool,
-    auto_size_ratio: float
-) -> Optional[Path]:
-    exif_date = extract_exif_date(image_path)
+    auto_size_ratio: float,
+    max_dim: int = 0,
+    jpeg_quality: int = 90,
+    jpeg_optimize: bool = False,
+    shard_output: bool = False,
+    stat_result: Optional[os.stat_result] = None
+) -> Optional[Tuple[Image.Image, Path, str, dict]]:
+    """解码并合成水印，返回 (图像, 输出路径, 保存格式, 保存参数)；跳过或失败时返回 None"""
+    # EXIF 解析与像素解码共用同一份内存数据
+    exif_date = extract_exif_date(io.BytesIO(data))
     if not exif_date and not fallback_use_mtime:
-        print(f"[跳过] {image_path} 无 EXIF 拍摄时间。")
+        logger.info("[跳过] %s 无 EXIF 拍摄时间。", image_path)
         return None
     if not exif_date and fallback_use_mtime:
-        ts = datetime.fromtimestamp(image_path.stat().st_mtime)
+        # 目录遍历时已取得的 stat 结果直接复用，省去一次 stat 系统调用
+        st = stat_result if stat_result is not None else image_path.stat()
+        ts = datetime.fromtimestamp(st.st_mtime)
         exif_date = ts.strftime("%Y-%m-%d")
 
     text = exif_date
 
-    # 输出目录固定为 output/
-    out_dir = out_root
-    out_dir.mkdir(parents=True, exist_ok=True)
-
     stem = image_path.stem
+    # 输出目录固定为 output/（由 process_path 预先创建）；分桶时放到 output/00..ff/ 下
+    out_dir = out_root / shard_name(stem) if shard_output else out_root
     ext = image_path.suffix.lower()
-    if ext not in [".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tiff"]:
+    if ext not in OUTPUT_FORMATS:
         ext = ".jpg"
     out_path = out_dir / f"{stem}_wm{ext}"
+    out_format = OUTPUT_FORMATS[ext]
 
     try:
         out_img = draw_watermark(
-            image_path=image_path,
+            src=io.BytesIO(data),
             text=text,
             font_path=font_path,
             font_size=font_size,
-            color=color,
-            opacity=opacity,
+            fill_rgba=fill_rgba,
             position=position,
             margin=margin,
             stroke_width=stroke_width,
-            stroke_fill=stroke_fill,
-            auto_size_ratio=auto_size_ratio
+            stroke_rgba=stroke_rgba,
+            auto_size_ratio=auto_size_ratio,
+            out_format=out_format,
+            max_dim=max_dim
         )
-        save_kwargs = {}
-        if out_path.suffix.lower() in (".jpg", ".jpeg"):
-            save_kwargs.update(dict(quality=92, subsampling=0, optimize=True))
-        out_img.save(out_path, **save_kwargs)
-        print(f"[完成] {image_path.name} → {out_path}")
+    except Exception as e:
+        logger.error("[失败] %s: %s", image_path, e)
+        return None
+
+    save_kwargs = {}
+    if out_format == "JPEG":
+        # optimize 会让 libjpeg 额外扫描一遍以计算最优 Huffman 表，编码耗时约翻倍而体积收益很小，
+        # 默认关闭；需要归档质量时可用 --jpeg-quality / --jpeg-optimize 调整
+        save_kwargs.update(dict(quality=jpeg_quality, subsampling=2,
+                                optimize=jpeg_optimize, progressive=False))
+    return out_img, out_path, out_format, save_kwargs
+
+
+def save_output(image_path: Path, out_img: Image.Image, out_path: Path,
+                out_format: str, save_kwargs: dict) -> Optional[Path]:
+    tmp_path = None
+    try:
+        # 先编码到内存，再一次性写入临时文件并原子替换：
+        # 避免编码器逐块的小写入，中途失败也不会留下半截输出文件。
+        # 临时文件名唯一：并行任务映射到同名输出时，不会互相覆盖对方未写完的临时文件；
+        # 用普通 open("xb") 独占创建，文件权限照常受 umask 约束（NamedTemporaryFile 固定为 0600）
+        buf = io.BytesIO()
+        out_img.save(buf, out_format, **save_kwargs)
+        candidate = out_path.with_name(f"{out_path.name}.{uuid.uuid4().hex}.tmp")
+        with open(candidate, "xb") as f:
+            tmp_path = candidate
+            f.write(buf.getbuffer())
+        tmp_path.replace(out_path)
+        logger.info("[完成] %s → %s", image_path.name, out_path)
         return out_path
     except Exception as e:
-        print(f"[失败] {image_path}: {e}")
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
+        logger.error("[失败] %s: %s", image_path, e)
+        return None
+
+
+def process_one(image_path: Path, stat_result: Optional[os.stat_result] = None,
+                **options) -> Optional[Path]:
+    # options 与 render_one 除 image_path / data / stat_result 外的参数一致
+    try:
+        data = image_path.read_bytes()
+    except OSError as e:
+        logger.error("[失败] %s: %s", image_path, e)
+        return None
+    rendered = render_one(image_path, data, stat_result=stat_result, **options)
+    if rendered is None:
         return None
+    return save_output(image_path, *rendered)
+
+
+PIPELINE_QUEUE_SIZE = 4
+
+
+def run_pipeline(files: list, render) -> None:
+    """
+    单进程三段流水线：读文件 → 解码/合成 → 编码/写盘。
+    读、写各占一个线程，合成在调用线程中进行；Pillow 的解码/编码会释放 GIL，
+    因此磁盘 I/O、编码与下一张图的合成可以相互重叠。
+    """
+    read_q = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    write_q = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+
+    def reader():
+        try:
+            for p, st in files:
+                try:
+                    read_q.put((p, st, p.read_bytes()))
+                except OSError as e:
+                    logger.error("[失败] %s: %s", p, e)
+        finally:
+            read_q.put(None)
+
+    def writer():
+        while True:
+            item = write_q.get()
+            if item is None:
+                return
+            save_output(*item)
+
+    with ThreadPoolExecutor(max_workers=1) as read_stage, \
+            ThreadPoolExecutor(max_workers=1) as write_stage:
+        read_stage.submit(reader)
+        write_done = write_stage.submit(writer)
+        item = ()
+        try:
+            while True:
+                item = read_q.get()
+                if item is None:
+                    break
+                p, st, data = item
+                rendered = render(p, data, stat_result=st)
+                if rendered is not None:
+                    write_q.put((p, *rendered))
+        finally:
+            write_q.put(None)
+            # 合成阶段异常退出时清空读取队列，避免读线程阻塞在 put 上
+            while item is not None:
+                item = read_q.get()
+        write_done.result()
+
+
+def _init_worker_logging(log_queue) -> None:
+    # 子进程只把日志记录放入队列，由主进程的 QueueListener 统一输出，避免各进程争用 stderr
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(logging.INFO)
 
 
-def is_image_file(p: Path) -> bool:
-    return p.suffix.lower() in (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+
+
+def is_image_file(name: str) -> bool:
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTS
+
+
+def iter_image_entries(root: Path) -> Iterator[os.DirEntry]:
+    # 用 os.scandir 递归遍历：DirEntry 自带文件类型信息，不必对每个条目再 stat
+    stack = [str(root)]
+    while stack:
+        d = stack.pop()
+        try:
+            with os.scandir(d) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False) and is_image_file(entry.name):
+                        yield entry
+        except OSError as e:
+            logger.error("无法读取目录：%s（%s）", d, e)
 
 
 def process_path(
     in_path: Path,
     font_path: Optional[str],
     font_size: int,
-    color: Tuple[int, int, int],
-    opacity: int,
+    fill_rgba: Tuple[int, int, int, int],
     position: str,
     margin: int,
     stroke_width: int,
-    stroke_fill: Tuple[int, int, int],
+    stroke_rgba: Tuple[int, int, int, int],
     fallback_use_mtime: bool,
-    auto_size_ratio: float
+    auto_size_ratio: float,
+    jobs: int = 1,
+    executor_kind: str = "process",
+    max_dim: int = 0,
+    jpeg_quality: int = 90,
+    jpeg_optimize: bool = False,
+    shard_output: bool = False
 ):
     if in_path.is_file():
         out_root = in_path.parent.parent / "output" if in_path.parent else Path("output")
-        process_one(
-            image_path=in_path,
-            out_root=out_root,
-            font_path=font_path,
-            font_size=font_size,
-            color=color,
-            opacity=opacity,
-            position=position,
-            margin=margin,
-            stroke_width=stroke_width,
-            stroke_fill=stroke_fill,
-            fallback_use_mtime=fallback_use_mtime,
-            auto_size_ratio=auto_size_ratio
-        )
+        files = [(in_path, None)]
     elif in_path.is_dir():
         out_root = in_path.parent / "output"
-        for p in in_path.rglob("*"):
-            if p.is_file() and is_image_file(p):
-                process_one(
-                    image_path=p,
-                    out_root=out_root,
-                    font_path=font_path,
-                    font_size=font_size,
-                    color=color,
-                    opacity=opacity,
-                    position=position,
-                    margin=margin,
-                    stroke_width=stroke_width,
-                    stroke_fill=stroke_fill,
-                    fallback_use_mtime=fallback_use_mtime,
-                    auto_size_ratio=auto_size_ratio
-                )
+        # 先完整列出文件，再按 inode 排序处理：磁盘上相邻的文件依次读取，
+        # 对机械硬盘与网络文件系统可减少寻道、提升预读命中
+        entries = sorted(iter_image_entries(in_path), key=lambda e: (e.inode(), e.path))
+        # 需要 mtime 兜底时，仅在 Windows 上顺带取出 DirEntry 的 stat 结果（目录枚举时已缓存，无额外系统调用；
+        # os.stat_result 可跨进程传递）。POSIX 上 DirEntry.stat() 是真实的 stat，留给任务在缺 EXIF 时再取
+        prefetch_stat = fallback_use_mtime and os.name == "nt"
+        files = [(Path(e.path), e.stat() if prefetch_stat else None) for e in entries]
     else:
-        print(f"输入路径不存在：{in_path}")
+        logger.error("输入路径不存在：%s", in_path)
+        return
+
+    # 输出目录只在主进程创建一次，避免各任务重复 mkdir（网络文件系统上元数据操作代价很高）
+    out_root.mkdir(parents=True, exist_ok=True)
+    if shard_output:
+        for name in sorted({shard_name(p.stem) for p, _ in files}):
+            (out_root / name).mkdir(exist_ok=True)
+
+    # 除图片路径外，其余参数在整个批次中都相同
+    options = dict(
+        out_root=out_root,
+        font_path=font_path,
+        font_size=font_size,
+        fill_rgba=fill_rgba,
+        position=position,
+        margin=margin,
+        stroke_width=stroke_width,
+        stroke_rgba=stroke_rgba,
+        fallback_use_mtime=fallback_use_mtime,
+        auto_size_ratio=auto_size_ratio,
+        max_dim=max_dim,
+        jpeg_quality=jpeg_quality,
+        jpeg_optimize=jpeg_optimize,
+        shard_output=shard_output
+    )
+
+    task = partial(process_one, **options)
+
+    workers = jobs if jobs > 0 else (os.cpu_count() or 1)
+    if len(files) <= 1:
+        for p, st in files:
+            task(p, st)
+        return
+    if workers == 1:
+        # 单进程时用读/算/写流水线重叠 I/O 与计算
+        run_pipeline(files, partial(render_one, **options))
+        return
+
+    # 每张图片一个任务并行处理：
+    # - process：多进程，绕开 GIL，CPU 密集的批量任务吞吐最高，但有进程启动与参数序列化开销；
+    # - thread：多线程，启动几乎无开销；Pillow 在 JPEG 解码/编码等 C 代码中会释放 GIL，
+    #   因此这些阶段可在线程间重叠（自由线程版 Python 上收益更明显）。
+    listener = None
+    if executor_kind == "thread":
+        pool = ThreadPoolExecutor(max_workers=workers)
+    else:
+        log_queue = multiprocessing.Queue()
+        listener = logging.handlers.QueueListener(
+            log_queue, *logging.getLogger().handlers, respect_handler_level=True
+        )
+        listener.start()
+        pool = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker_logging, initargs=(log_queue,)
+        )
+    try:
+        with pool as executor:
+            futures = [executor.submit(task, p, st) for p, st in files]
+            for fut in futures:
+                fut.result()
+    finally:
+        if listener is not None:
+            listener.stop()
 
 
 def build_argparser():
@@ -261,37 +589,58 @@ def build_argparser():
     ap.add_argument("--font-size", type=int, default=96, help="字体大小（默认 96）")
     ap.add_argument("--auto-size", type=float, default=0.0,
                     help="按图片短边比例自动决定字体大小（如 0.12 表示短边 12%%，覆盖 --font-size）")
+    ap.add_argument("--max-dim", type=int, default=0,
+                    help="将输出图片长边缩小到不超过该像素值（默认 0 不缩放；JPEG 会在解码时直接降采样）")
     ap.add_argument("--color", default="#FFFFFF", help="文字颜色，#RRGGBB 或颜色名（默认 #FFFFFF）")
     ap.add_argument("--opacity", type=int, default=220, help="不透明度 0-255（默认 220）")
     ap.add_argument("--margin", type=int, default=20, help="边距像素（默认 20）")
     ap.add_argument("--font", type=str, default=None, help="TrueType 字体路径（可选）")
     ap.add_argument("--stroke-width", type=int, default=2, help="描边宽度（默认 2）")
     ap.add_argument("--stroke-color", default="#000000", help="描边颜色（默认 #000000）")
+    ap.add_argument("--jpeg-quality", type=int, default=90, help="JPEG 输出质量 1-95（默认 90）")
+    ap.add_argument("--jpeg-optimize", action="store_true",
+                    help="JPEG 输出时优化 Huffman 表（文件略小，但编码更慢）")
     ap.add_argument("--fallback-mtime", action="store_true",
                     help="当无 EXIF 日期时使用文件修改时间作为水印日期")
+    ap.add_argument("--jobs", type=int, default=1,
+                    help="并行任务数（默认 1，0 表示使用全部 CPU 核心）")
+    ap.add_argument("--shard-output", action="store_true",
+                    help="按文件名哈希把输出分散到 output/00..ff 子目录，减少超大批量时单目录的元数据争用")
+    ap.add_argument("--executor", default="process", choices=["process", "thread"],
+                    help="并行方式：process 多进程（默认）或 thread 多线程")
     return ap
 
 
 def main():
     ap = build_argparser()
     args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
 
     in_path = Path(args.path).expanduser().resolve()
     color = parse_color(args.color)
     stroke_color = parse_color(args.stroke_color)
+    # 不透明度只需在启动时裁剪一次，直接组装好文字与描边的 RGBA 颜色向下传递
+    alpha = max(0, min(255, int(args.opacity)))
+    fill_rgba = (*color, alpha)
+    stroke_rgba = (*stroke_color, alpha)
 
     process_path(
         in_path=in_path,
         font_path=args.font,
         font_size=args.font_size,
-        color=color,
-        opacity=max(0, min(255, int(args.opacity))),
+        fill_rgba=fill_rgba,
         position=args.position,
         margin=max(0, int(args.margin)),
         stroke_width=max(0, int(args.stroke_width)),
-        stroke_fill=stroke_color,
+        stroke_rgba=stroke_rgba,
         fallback_use_mtime=bool(args.fallback_mtime),
         auto_size_ratio=float(args.auto_size),
+        jobs=max(0, int(args.jobs)),
+        executor_kind=args.executor,
+        max_dim=max(0, int(args.max_dim)),
+        jpeg_quality=max(1, min(95, int(args.jpeg_quality))),
+        jpeg_optimize=bool(args.jpeg_optimize),
+        shard_output=bool(args.shard_output),
     )
 
 
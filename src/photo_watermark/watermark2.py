@@ -7,17 +7,42 @@ Photo Watermark 2 - 单文件桌面应用 (Windows / macOS)
 
 import os
 import sys
+import copy
 import json
 import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
 import platform, subprocess
 
+try:
+    import numpy as np  # 可选：存在时导出合成走向量化混合
+except ImportError:
+    np = None
+
+try:
+    import orjson  # 可选：存在时设置/模板的读写走 orjson
+except ImportError:
+    orjson = None
+
+try:
+    # 可选：导出的合成与编码交给 Pillow（装 pillow-simd 即自动使用其 SIMD 内核）
+    from PIL import Image as PILImage
+except ImportError:
+    PILImage = None
+
+# Pillow 导出需显式开启（环境变量 PHOTO_WATERMARK_PIL_EXPORT=1）；默认走 Qt/numpy 路径
+USE_PIL_EXPORT = PILImage is not None and os.environ.get("PHOTO_WATERMARK_PIL_EXPORT") == "1"
+
 from PySide6.QtCore import (
-    Qt, QSize, QRect, QPoint, QPointF, QStandardPaths, QByteArray, QEvent, Signal, QObject
+    Qt, QSize, QRect, QRectF, QPoint, QPointF, QStandardPaths, QByteArray, QEvent, Signal, QObject,
+    QTimer, QRunnable, QThreadPool
 )
 from PySide6.QtGui import (
-    QAction, QIcon, QPixmap, QImage, QPainter, QColor, QFont, QFontDatabase,
-    QPen, QPainterPath, QTransform, QGuiApplication, QPalette
+    QAction, QIcon, QPixmap, QImage, QPainter, QColor, QFont, QFontDatabase, QFontMetrics,
+    QPen, QPainterPath, QTransform, QGuiApplication, QPalette, QPixmapCache, QImageReader, QImageIOHandler
 )
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QFileDialog, QListWidget, QListWidgetItem,
@@ -29,16 +54,138 @@ from PySide6.QtWidgets import (
 
 APP_NAME = "Photo Watermark 2"
 SUPPORTED_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff"}
+SUPPORTED_EXTS_TUPLE = tuple(SUPPORTED_EXTS)  # 供 str.endswith 直接判断，免去 Path/suffix 解析
+PREVIEW_MAX_SIDE = 2048  # 预览用底图的最长边；原图只在导出时读取
+PREVIEW_LRU_SIZE = 4     # 常驻内存的预览图数量上限
+
+# 影响水印像素的设置项；位置/锚点/导出参数不在其中，拖拽时不会触发重新栅格化
+WM_BUILD_FIELDS = (
+    "watermark_type", "text", "font_family", "font_px", "bold", "italic", "text_color", "opacity",
+    "outline", "outline_px", "outline_color", "shadow", "shadow_dx", "shadow_dy", "shadow_color",
+    "image_path", "image_scale_percent", "image_opacity",
+)
+WM_KEY_FIELDS = WM_BUILD_FIELDS + ("rotation_deg",)
+WM_CACHE_SIZE = 32
+
+# 深色 Fusion 主题的调色板表：(角色, 颜色)
+DARK_PALETTE = (
+    (QPalette.Window, QColor(30, 30, 30)),
+    (QPalette.WindowText, QColor(Qt.white)),
+    (QPalette.Base, QColor(25, 25, 25)),
+    (QPalette.AlternateBase, QColor(45, 45, 45)),
+    (QPalette.ToolTipBase, QColor(Qt.white)),
+    (QPalette.ToolTipText, QColor(Qt.white)),
+    (QPalette.Text, QColor(Qt.white)),
+    (QPalette.Button, QColor(45, 45, 45)),
+    (QPalette.ButtonText, QColor(Qt.white)),
+    (QPalette.BrightText, QColor(Qt.red)),
+    (QPalette.Highlight, QColor(80, 130, 190)),
+    (QPalette.HighlightedText, QColor(Qt.white)),
+)
 
 def human_path(p: Path) -> str:
-    try:
-        return str(p)
-    except Exception:
-        return p.as_posix()
+    return str(p)
+
+def scan_image_dir(d) -> list[str]:
+    """列出目录（仅一层）下受支持的图片；scandir 复用目录项自带的类型信息，不再逐个 stat"""
+    paths = []
+    with os.scandir(d) as it:
+        for entry in it:
+            if entry.name.lower().endswith(SUPPORTED_EXTS_TUPLE) and entry.is_file(follow_symlinks=False):
+                paths.append(entry.path)
+    return paths
+
+def scan_image_dirs(dirs: list) -> list[list[str]]:
+    """并发扫描多个目录（各自仅一层），按输入顺序返回每个目录的结果；读不了的目录返回空表。
+    网络盘上每次 scandir 的往返延迟可观，多个目录并行列举可把延迟重叠起来。"""
+    def scan(d):
+        try:
+            return scan_image_dir(d)
+        except OSError:
+            return []
+    if len(dirs) <= 1:
+        return [scan(d) for d in dirs]
+    with ThreadPoolExecutor(max_workers=min(8, len(dirs))) as pool:
+        return list(pool.map(scan, dirs))
+
+def dropped_image_paths(md) -> list[str]:
+    """从拖放的 mime 数据中取出受支持的图片：文件直接收下，目录仅扫描一层；保持拖入顺序"""
+    if not md.hasUrls():
+        return []
+    groups = []  # 每个拖入项的结果；目录先占位，并发扫描后回填
+    dirs = []
+    for u in md.urls():
+        f = u.toLocalFile()
+        p = Path(f)
+        if not p.exists():
+            continue
+        if f.lower().endswith(SUPPORTED_EXTS_TUPLE) and p.is_file():
+            groups.append([str(p)])
+        elif p.is_dir():
+            groups.append([])
+            dirs.append((len(groups) - 1, p))
+    for (i, _), found in zip(dirs, scan_image_dirs([d for _, d in dirs])):
+        groups[i] = found
+    return [f for g in groups for f in g]
 
 def clamp(v, lo, hi):
     return max(lo, min(hi, v))
 
+# 32 位 ARGB 格式按 0xAARRGGBB 整数存储：小端机器上字节序为 B,G,R,A
+_ARGB32_ALPHA = 3 if sys.byteorder == "little" else 0
+
+def _pixel_view(img: QImage, writable=False):
+    """把每像素 4 字节的 QImage 视为 (h, w, 4) 的 uint8 数组（零拷贝）"""
+    buf = img.bits() if writable else img.constBits()
+    arr = np.frombuffer(buf, np.uint8).reshape(img.height(), img.bytesPerLine())
+    return arr[:, :img.width() * 4].reshape(img.height(), img.width(), 4)
+
+def numpy_alpha_blend(dst: QImage, wm: QImage, x: int, y: int, opacity: int = 100) -> None:
+    """将 wm 以 (x, y) 为左上角按 alpha 就地混合到 dst 上，只处理相交区域，不分配整图。
+    dst 须为 Format_RGB32 或 Format_ARGB32_Premultiplied（字节布局相同、均按预乘计算），由调用方保证可写"""
+    opacity = int(clamp(opacity, 0, 100))
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + wm.width(), dst.width()), min(y + wm.height(), dst.height())
+    if opacity == 0 or x0 >= x1 or y0 >= y1:
+        return
+    src = wm
+    if src.format() != QImage.Format_ARGB32_Premultiplied:
+        src = src.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+
+    s = _pixel_view(src)[y0 - y:y1 - y, x0 - x:x1 - x]
+    d = _pixel_view(dst, writable=True)[y0:y1, x0:x1]
+    if opacity < 100:
+        s = s.astype(np.uint32) * opacity // 100  # 预乘格式：整体透明度对四个通道同比缩放
+
+    a = s[..., _ARGB32_ALPHA]
+    # 三路分支：全不透明直接拷贝，全透明跳过，只有半透明像素做混合运算
+    opaque = a == 255
+    partial = (a != 0) & ~opaque
+    if opaque.any():
+        d[opaque] = s[opaque]
+    if partial.any():
+        sp = s[partial].astype(np.uint32)
+        dp = d[partial].astype(np.uint32)
+        # 预乘 source-over：out = s + d * (255 - a) / 255；不透明底图（RGB32）的 alpha 结果仍为 255
+        inv = 255 - sp[:, _ARGB32_ALPHA:_ARGB32_ALPHA + 1]
+        d[partial] = sp + (dp * inv + 127) // 255
+
+def settings_delta(settings: dict, base: dict) -> dict:
+    """只保留与 base 不同的项（export 子表逐项比较），用于精简 last_session.json"""
+    delta = {k: v for k, v in settings.items() if k != "export" and base.get(k) != v}
+    ex = {k: v for k, v in settings.get("export", {}).items() if base.get("export", {}).get(k) != v}
+    if ex:
+        delta["export"] = ex
+    return delta
+
+def merge_settings(base: dict, delta: dict) -> dict:
+    """把（可能只含差异项的）设置合并到 base 上并返回 base；完整模板同样适用"""
+    ex = delta.get("export")
+    base.update({k: v for k, v in delta.items() if k != "export"})
+    if isinstance(ex, dict):
+        base["export"].update(ex)
+    return base
+
 def project_root() -> Path:
     # Windows：打包(onefile)后放在 exe 同级目录；源码运行用项目根
     if getattr(sys, "frozen", False):
@@ -57,6 +204,26 @@ def templates_dir() -> Path:
     p.mkdir(parents=True, exist_ok=True)
     return p
 
+_TEMPLATE_CACHE: dict[str, tuple[int, list[str]]] = {}  # 模板目录 -> (目录 mtime, 排序后的模板名)
+
+def list_template_names() -> list[str]:
+    """templates/ 下的模板名（不含 .json）；目录 mtime 未变时直接用缓存，不再重新列目录"""
+    d = templates_dir()
+    key = str(d)
+    mtime = os.stat(d).st_mtime_ns
+    cached = _TEMPLATE_CACHE.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with os.scandir(d) as it:
+        files = sorted(e.name for e in it if e.name.endswith(".json") and e.is_file())
+    names = [f[:-len(".json")] for f in files]
+    _TEMPLATE_CACHE[key] = (mtime, names)
+    return names
+
+def invalidate_template_cache():
+    # 增删模板后调用：mtime 精度较粗的文件系统上，同一时间片内的变化未必反映到 mtime
+    _TEMPLATE_CACHE.clear()
+
 def default_template_path() -> Path:
     return templates_dir() / "default.json"
 
@@ -110,6 +277,295 @@ def default_settings() -> dict:
     }
 
 
+def make_preview_image(img: QImage) -> QImage:
+    """预览只用降采样图，避免每次缩放都扫一遍整张原图；
+    在解码线程里就转成预乘 ARGB32，LRU 里存的即是预览控件要的格式，切图时无需再转换"""
+    if max(img.width(), img.height()) > PREVIEW_MAX_SIDE:
+        img = img.scaled(QSize(PREVIEW_MAX_SIDE, PREVIEW_MAX_SIDE), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    if img.format() != QImage.Format_ARGB32_Premultiplied:
+        img = img.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    return img
+
+def read_image_within(path: str, max_w: int, max_h: int) -> QImage:
+    """解码时直接缩到不超过 max_w x max_h：JPEG 等解码器可借 IDCT 缩放跳过大部分像素。
+    解码器本身不支持缩放（PNG/BMP 等）或读不到文件头尺寸时完整解码，交给调用方缩放——
+    否则 Qt 会在整张原图上补一次平滑缩放，缩略图就用不上 make_thumbnail 的快速预缩"""
+    reader = QImageReader(path)
+    size = reader.size()
+    if (size.isValid() and (size.width() > max_w or size.height() > max_h)
+            and reader.supportsOption(QImageIOHandler.ScaledSize)):
+        reader.setScaledSize(size.scaled(max_w, max_h, Qt.KeepAspectRatio))
+    return reader.read()
+
+def make_thumbnail(img: QImage, dpr: float = 1.0) -> QImage:
+    """缩略图（按设备像素比生成）：先快速降到 2 倍目标宽度，再对小图做一次平滑缩放"""
+    tw, th = max(1, round(112 * dpr)), max(1, round(84 * dpr))
+    thumb = img.scaledToWidth(tw * 2, Qt.FastTransformation) if img.width() > tw * 2 else img
+    thumb = thumb.scaled(QSize(tw, th), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    thumb.setDevicePixelRatio(dpr)
+    return thumb
+
+
+# ------------------ 导出（纯函数，可在工作线程中调用） ------------------
+ANCHOR_MARGIN = 12  # 像素
+
+@lru_cache(maxsize=32)
+def make_font(family: str, px: int, bold: bool, italic: bool) -> QFont:
+    """按字体参数缓存 QFont；返回的是共享对象，调用方只读不改"""
+    font = QFont(family)
+    font.setPixelSize(px)
+    font.setBold(bold)
+    font.setItalic(italic)
+    return font
+
+@lru_cache(maxsize=32)
+def font_metrics(family: str, px: int, bold: bool, italic: bool) -> QFontMetrics:
+    """按字体参数缓存 QFontMetrics，省去每次测量时的字体引擎查找"""
+    return QFontMetrics(make_font(family, px, bold, italic))
+
+@lru_cache(maxsize=128)
+def anchor_top_left(anchor: str, base_w: int, base_h: int, wm_w: float, wm_h: float,
+                    pos_ratio=(0.5, 0.5)) -> tuple[int, int]:
+    """返回水印在“原图坐标系”中的左上角像素；custom 时按 pos_ratio 换算。
+    纯函数且参数即完整输入，预览每帧重绘时命中缓存，无需另行失效。"""
+    margin = ANCHOR_MARGIN
+    if anchor == "tl":
+        x = margin; y = margin
+    elif anchor == "tc":
+        x = (base_w - wm_w)/2; y = margin
+    elif anchor == "tr":
+        x = base_w - wm_w - margin; y = margin
+    elif anchor == "cl":
+        x = margin; y = (base_h - wm_h)/2
+    elif anchor == "cc":
+        x = (base_w - wm_w)/2; y = (base_h - wm_h)/2
+    elif anchor == "cr":
+        x = base_w - wm_w - margin; y = (base_h - wm_h)/2
+    elif anchor == "bl":
+        x = margin; y = base_h - wm_h - margin
+    elif anchor == "bc":
+        x = (base_w - wm_w)/2; y = base_h - wm_h - margin
+    elif anchor == "br":
+        x = base_w - wm_w - margin; y = base_h - wm_h - margin
+    else:
+        # custom
+        x = float(pos_ratio[0]) * base_w
+        y = float(pos_ratio[1]) * base_h
+    return int(x), int(y)
+
+def compute_export_size(w: int, h: int, ex: dict) -> tuple[int, int]:
+    mode = ex.get("resize_mode", "none")
+    val = int(ex.get("resize_value", 100))
+    if mode == "width":
+        nw = max(1, val)
+        nh = max(1, int(h * nw / w))
+    elif mode == "height":
+        nh = max(1, val)
+        nw = max(1, int(w * nh / h))
+    elif mode == "percent":
+        nw = max(1, int(w * val / 100.0))
+        nh = max(1, int(h * val / 100.0))
+    else:
+        nw, nh = w, h
+    return nw, nh
+
+def _is_opaque(img: QImage) -> bool:
+    """图像是否实际不含透明像素；无法低成本判断时按含透明处理"""
+    if not img.hasAlphaChannel():
+        return True
+    if np is not None and img.format() in (QImage.Format_ARGB32, QImage.Format_ARGB32_Premultiplied):
+        return bool(_pixel_view(img)[..., _ARGB32_ALPHA].min() == 255)
+    return False
+
+def save_image(img: QImage, out_path: Path, ex: dict):
+    fmt = ex["out_format"].upper()
+    if fmt == "JPEG":
+        # 透明背景合成白底（或可改为黑/自定义）；RGB32 行按 4 字节对齐，绘制与编码都比 RGB888 快
+        # hasAlphaChannel() 只看格式，带 alpha 格式但像素全不透明时直接转换，不再铺白底重绘
+        if not _is_opaque(img):
+            bg = QImage(img.size(), QImage.Format_RGB32)
+            bg.fill(Qt.white)
+            p = QPainter(bg)
+            p.drawImage(0, 0, img)
+            p.end()
+            img = bg
+        elif img.format() != QImage.Format_RGB32:
+            img = img.convertToFormat(QImage.Format_RGB32)
+        quality = int(ex["jpeg_quality"])
+        img.save(str(out_path), "JPEG", quality)
+    else:
+        # PNG 保持透明
+        img.save(str(out_path), "PNG")
+
+def watermark_xy(settings: dict, base_w: int, base_h: int, wm_w: int, wm_h: int) -> tuple[int, int]:
+    """导出时水印左上角位置（基于缩放后的底图尺寸）"""
+    anchor = settings.get("anchor", "custom")
+    if anchor != "custom":
+        return anchor_top_left(anchor, base_w, base_h, wm_w, wm_h)
+    x_ratio = float(settings.get("pos_ratio_x", 0.5))
+    y_ratio = float(settings.get("pos_ratio_y", 0.5))
+    # 注意：pos_ratio 是基于“原图”的，导出时我们已将 base 变为缩放后的，
+    # 但 pos_ratio 本质是相对比例，因此仍可直接乘以当前 base 尺寸
+    x = int(x_ratio * base_w)
+    y = int(y_ratio * base_h)
+
+    # 限制不越界
+    x = clamp(x, 0, max(0, base_w - wm_w))
+    y = clamp(y, 0, max(0, base_h - wm_h))
+    return x, y
+
+def qimage_to_pil(img: QImage):
+    img = img.convertToFormat(QImage.Format_RGBA8888)
+    return PILImage.frombuffer("RGBA", (img.width(), img.height()), bytes(img.constBits()),
+                               "raw", "RGBA", img.bytesPerLine(), 1)
+
+def export_watermark_pil(wm: QImage):
+    """Pillow 导出时把共享水印转换一次，整批复用；未启用 Pillow 导出或无水印时返回 None"""
+    if not USE_PIL_EXPORT or wm.isNull():
+        return None
+    return qimage_to_pil(wm)
+
+def render_and_save_pil(src_path: str, out_path: Path, settings: dict, wm_pil):
+    """Pillow 版导出：缩放、alpha 合成与编码均在 Pillow 中完成；水印仍由 Qt 绘制（字体按字族名选取）。
+    wm_pil 为 export_watermark_pil 预先转换好的共享水印（只读），None 表示无水印"""
+    ex = settings["export"]
+    is_jpeg = ex["out_format"].upper() == "JPEG"
+    with PILImage.open(src_path) as im:
+        icc = im.info.get("icc_profile")
+        has_alpha = "A" in im.getbands() or "transparency" in im.info
+        # 不透明原图保持 RGB，省去 RGBA 转换与白底合成
+        base = im.convert("RGBA" if has_alpha else "RGB")
+    nw, nh = compute_export_size(base.width, base.height, ex)
+    if (nw, nh) != base.size:
+        base = base.resize((nw, nh), PILImage.LANCZOS)
+    if is_jpeg and has_alpha:
+        # 透明背景合成白底，与 Qt 路径一致
+        bg = PILImage.new("RGB", base.size, (255, 255, 255))
+        bg.paste(base, mask=base.getchannel("A"))
+        base = bg
+
+    if wm_pil is not None:
+        x, y = watermark_xy(settings, base.width, base.height, wm_pil.width, wm_pil.height)
+        # 只合成水印与底图相交的区域
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + wm_pil.width, base.width), min(y + wm_pil.height, base.height)
+        if x0 < x1 and y0 < y1:
+            layer = wm_pil.crop((x0 - x, y0 - y, x1 - x, y1 - y))
+            box = (x0, y0, x1, y1)
+            region = base.crop(box).convert("RGBA")
+            region.alpha_composite(layer)
+            base.paste(region.convert(base.mode), box)
+
+    # 保留原图的 ICC 配置文件，广色域（如 Display P3）照片导出后颜色不变
+    if is_jpeg:
+        base.save(str(out_path), "JPEG", quality=int(ex["jpeg_quality"]), icc_profile=icc)
+    else:
+        base.save(str(out_path), "PNG", icc_profile=icc)
+
+def render_and_save(src_path: str, out_path: Path, settings: dict, wm: QImage, wm_pil=None):
+    """读取原图 -> 按导出设置缩放 -> 合成已旋转的水印 wm -> 写出。
+    水印与底图尺寸无关，由调用方生成一次后在多张图之间共享（只读）；
+    wm_pil 为 export_watermark_pil(wm) 的结果，仅在启用 Pillow 导出时使用。"""
+    if USE_PIL_EXPORT:
+        render_and_save_pil(src_path, out_path, settings, wm_pil)
+        return
+    ex = settings["export"]
+    base = QImage(src_path)
+    if base.isNull():
+        raise RuntimeError(f"无法读取图片：{src_path}")
+    # 尺寸调整
+    nw, nh = compute_export_size(base.width(), base.height(), ex)
+    if (nw, nh) != (base.width(), base.height()):
+        base = base.scaled(nw, nh, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+    if wm.isNull():
+        # 若未设置水印，直接按导出格式保存
+        save_image(base, out_path, ex)
+        return
+
+    # 位置
+    x, y = watermark_xy(settings, base.width(), base.height(), wm.width(), wm.height())
+
+    # 合成（水印透明度已在生成时计入）
+    # 直接在底图上合成水印，不再额外分配整图画布并整图拷贝一次；
+    # RGB32（JPEG 解码结果）与 ARGB32_Premultiplied 都是 QPainter 的快速目标格式，也是 numpy 就地混合的输入格式
+    # 其余格式只转换一次：无 alpha 的源保持不透明（RGB32），之后保存 JPEG 也无需再铺白底
+    out = base
+    if out.format() not in (QImage.Format_RGB32, QImage.Format_ARGB32_Premultiplied):
+        out = out.convertToFormat(QImage.Format_ARGB32_Premultiplied if out.hasAlphaChannel() else QImage.Format_RGB32)
+    if np is not None:
+        numpy_alpha_blend(out, wm, x, y)
+    else:
+        p = QPainter(out)
+        p.setRenderHints(QPainter.Antialiasing | QPainter.SmoothPixmapTransform)
+        p.drawImage(x, y, wm)
+        p.end()
+
+    save_image(out, out_path, ex)
+
+
+# ------------------ 后台解码 ------------------
+class WorkerSignals(QObject):
+    decoded = Signal(str, bool, QImage, QImage)  # path, 是否解码成功, 预览图, 缩略图（未请求时为空图）
+
+
+class DecodeWorker(QRunnable):
+    """在线程池中解码图片并按需生成预览图/缩略图；只产出 QImage，不触碰任何 GUI 对象。
+    解码时即缩到所需尺寸，不保留原图，导出时再从磁盘读取。"""
+
+    def __init__(self, path: str, dpr: float = 1.0, with_preview=True, with_thumb=True):
+        super().__init__()
+        self.path = path
+        self.dpr = dpr
+        self.with_preview = with_preview
+        self.with_thumb = with_thumb
+        self.signals = WorkerSignals()
+
+    def run(self):
+        if self.with_preview:
+            img = read_image_within(self.path, PREVIEW_MAX_SIDE, PREVIEW_MAX_SIDE)
+        else:
+            # 只要缩略图：解码到 2 倍目标尺寸即可，剩下交给 make_thumbnail 的平滑缩放
+            tw, th = max(1, round(112 * self.dpr)), max(1, round(84 * self.dpr))
+            img = read_image_within(self.path, tw * 2, th * 2)
+        if img.isNull():
+            self.signals.decoded.emit(self.path, False, QImage(), QImage())
+            return
+        preview_img = make_preview_image(img) if self.with_preview else QImage()
+        thumb = make_thumbnail(img, self.dpr) if self.with_thumb else QImage()
+        self.signals.decoded.emit(self.path, True, preview_img, thumb)
+
+
+class ExportSignals(QObject):
+    exported = Signal(str, bool, str)  # path, 是否成功, 错误信息
+
+
+class ExportWorker(QRunnable):
+    """在线程池中导出一张图片；settings 为设置快照，wm/wm_pil 为共享只读水印，均不触碰 GUI 对象"""
+
+    def __init__(self, src_path: str, out_path: Path, settings: dict, wm: QImage,
+                 signals: ExportSignals, cancel: threading.Event, wm_pil=None):
+        super().__init__()
+        self.src_path = src_path
+        self.out_path = out_path
+        self.settings = settings
+        self.wm = wm
+        self.wm_pil = wm_pil
+        self.signals = signals
+        self.cancel = cancel
+
+    def run(self):
+        if self.cancel.is_set():
+            self.signals.exported.emit(self.src_path, False, "已取消")
+            return
+        try:
+            render_and_save(self.src_path, self.out_path, self.settings, self.wm, self.wm_pil)
+        except Exception as e:
+            self.signals.exported.emit(self.src_path, False, str(e))
+            return
+        self.signals.exported.emit(self.src_path, True, "")
+
+
 # ------------------ 颜色按钮 ------------------
 class ColorButton(QPushButton):
     colorChanged = Signal(QColor)
@@ -167,8 +623,11 @@ class PreviewLabel(QLabel):
         self.main = main
 
         self._base_image = QImage()
+        self._base_size = QSize()  # 原图尺寸；_base_image 可能是降采样后的预览图
         self._base_path = ""
-        self._scaled_pixmap = QPixmap()
+        self._scaled_image = QImage()  # 显示面直接用 QImage + drawImage，省去 QPixmap 往返
+        self._scaled_cache_key = None  # (path, w, h)：与当前缩放结果对应，未变化时不重复缩放
+        self._scaled_smooth = False  # 当前缩放结果是否为平滑插值（拖拽中为快速插值）
         self._scale_factor = 1.0  # 预览图相对原图的缩放（宽度比）
         self._offset = QPoint(0, 0)  # 预览区域中图像相对于label的偏移（居中留黑边时）
         self._dragging = False
@@ -176,12 +635,23 @@ class PreviewLabel(QLabel):
         self._wm_prev_pix = QPixmap()
         self._wm_prev_size = QSize()
 
+        # 拖拽中用快速插值，松开后延迟补一次平滑缩放
+        self._hq_timer = QTimer(self)
+        self._hq_timer.setSingleShot(True)
+        self._hq_timer.timeout.connect(self._rescale_hq)
+
         self.setMinimumSize(420, 360)
 
-    def setImage(self, img: QImage, path: str):
+    def setImage(self, img: QImage, path: str, base_size: QSize = None):
+        # 统一为预乘 ARGB32：Qt 缩放/合成在该格式上走最快路径（RGB32、索引色 PNG 等都会先被转换）；
+        # 解码线程产出的预览图已是该格式，这里只兜底其他来源
+        if not img.isNull() and img.format() != QImage.Format_ARGB32_Premultiplied:
+            img = img.convertToFormat(QImage.Format_ARGB32_Premultiplied)
         self._base_image = img
+        self._base_size = QSize(base_size) if base_size is not None else img.size()
         self._base_path = path
-        self.updateScaledPixmap()
+        self._scaled_cache_key = None
+        self._update_scaled_fast_then_smooth()
         self.update()
 
     def sizeHint(self):
@@ -189,34 +659,63 @@ class PreviewLabel(QLabel):
 
     def resizeEvent(self, e):
         super().resizeEvent(e)
-        self.updateScaledPixmap()
+        self._update_scaled_fast_then_smooth()
+
+    def _update_scaled_fast_then_smooth(self):
+        """切图/窗口缩放等中间状态先用快速插值出图，空闲 100ms 后再补平滑缩放（缓存命中时直接是平滑结果）"""
+        self.updateScaledPixmap(smooth=False)
+        if not self._scaled_smooth:
+            self._hq_timer.start(100)
 
-    def updateScaledPixmap(self):
+    def updateScaledPixmap(self, smooth=None):
         if self._base_image.isNull():
-            self._scaled_pixmap = QPixmap()
+            self._scaled_image = QImage()
+            self._scaled_cache_key = None
             self._scale_factor = 1.0
             self._offset = QPoint(0, 0)
             return
         avail = self.size()
-        img_w = self._base_image.width()
-        img_h = self._base_image.height()
+        img_w = self._base_size.width()
+        img_h = self._base_size.height()
         if img_w == 0 or img_h == 0:
             return
         scale = min(avail.width() / img_w, avail.height() / img_h)
         scale = max(scale, 0.0001)
         self._scale_factor = scale
         scaled_size = QSize(int(img_w * scale), int(img_h * scale))
-        pm = QPixmap.fromImage(self._base_image).scaled(
-            scaled_size, Qt.KeepAspectRatio, Qt.SmoothTransformation
-        )
-        self._scaled_pixmap = pm
         self._offset = QPoint(
             (avail.width() - scaled_size.width()) // 2,
             (avail.height() - scaled_size.height()) // 2
         )
+        key = (self._base_path, scaled_size.width(), scaled_size.height())
+        if smooth is None:
+            smooth = not self._dragging
+        if key == self._scaled_cache_key and (self._scaled_smooth or not smooth):
+            # 同一张图、同一目标尺寸：复用已缩放的底图，跳过耗时的平滑缩放
+            return
+        # 平滑结果放进全局 QPixmapCache，切换缩略图再切回时直接取用（快速档也优先用它）；
+        # 光栅后端下命中时 toImage 只是浅拷贝，插入时的一次转换换来之后的免缩放
+        cache_key = f"{self._base_path}@{scaled_size.width()}x{scaled_size.height()}"
+        pm = QPixmapCache.find(cache_key)
+        if pm is not None and not pm.isNull():
+            self._scaled_image = pm.toImage()
+            smooth = True
+        else:
+            mode = Qt.SmoothTransformation if smooth else Qt.FastTransformation
+            self._scaled_image = self._base_image.scaled(scaled_size, Qt.KeepAspectRatio, mode)
+            if smooth:
+                QPixmapCache.insert(cache_key, QPixmap.fromImage(self._scaled_image))
+        self._scaled_cache_key = key
+        self._scaled_smooth = smooth
         # 预先请求一次水印（用于命中测试）
         self.requestPreviewWatermark.emit()
 
+    def _rescale_hq(self):
+        if self._dragging or self._scaled_smooth:
+            return
+        self.updateScaledPixmap()
+        self.update()
+
     def paintEvent(self, e):
         super().paintEvent(e)
 
@@ -233,34 +732,41 @@ class PreviewLabel(QLabel):
             return
 
         # 2) 画底图
-        if not self._scaled_pixmap.isNull():
-            p.drawPixmap(self._offset, self._scaled_pixmap)
+        if not self._scaled_image.isNull():
+            p.drawImage(self._offset, self._scaled_image)
 
         # 3) 画水印（不在 paintEvent 里发信号/做计算，只使用缓存的 _wm_prev_pix）
         wm = self._wm_prev_pix
         if not wm.isNull():
-            st = self.main.settings
-            base_w = self._base_image.width()
-            base_h = self._base_image.height()
-            anchor = st.get("anchor", "custom")
+            p.drawPixmap(self._wm_rect().topLeft(), wm)
 
-            if anchor != "custom":
-                x_px, y_px = self.main.calc_anchor_top_left(
-                    anchor, base_w, base_h,
-                    for_preview=True, wm_preview_size=wm.size()
-                )
-                x_ratio = x_px / base_w
-                y_ratio = y_px / base_h
-            else:
-                x_ratio = float(st.get("pos_ratio_x", 0.5))
-                y_ratio = float(st.get("pos_ratio_y", 0.5))
+        p.end()
 
-            x = self._offset.x() + int(x_ratio * base_w * self._scale_factor)
-            y = self._offset.y() + int(y_ratio * base_h * self._scale_factor)
-            p.drawPixmap(x, y, wm)
 
-        p.end()
+    def _wm_rect(self) -> QRect:
+        """预览水印在控件坐标系中的矩形；拖拽时据此只重绘新旧位置"""
+        wm = self._wm_prev_pix
+        base_w = self._base_size.width()
+        base_h = self._base_size.height()
+        if wm.isNull() or base_w <= 0 or base_h <= 0:
+            return QRect()
+        st = self.main.settings
+        anchor = st.get("anchor", "custom")
+
+        if anchor != "custom":
+            x_px, y_px = self.main.calc_anchor_top_left(
+                anchor, base_w, base_h,
+                for_preview=True, wm_preview_size=wm.size()
+            )
+            x_ratio = x_px / base_w
+            y_ratio = y_px / base_h
+        else:
+            x_ratio = float(st.get("pos_ratio_x", 0.5))
+            y_ratio = float(st.get("pos_ratio_y", 0.5))
 
+        x = self._offset.x() + int(x_ratio * base_w * self._scale_factor)
+        y = self._offset.y() + int(y_ratio * base_h * self._scale_factor)
+        return QRect(QPoint(x, y), wm.size())
 
     def mousePressEvent(self, e):
         if e.button() == Qt.LeftButton and not self._base_image.isNull():
@@ -269,7 +775,7 @@ class PreviewLabel(QLabel):
             self._last_mouse = e.pos()
             # —— 兜底：若当前是预设锚点（非 custom），先把当前位置折算为 pos_ratio 再切到 custom
             if self.main.settings.get("anchor", "custom") != "custom":
-                base_w, base_h = self._base_image.width(), self._base_image.height()
+                base_w, base_h = self._base_size.width(), self._base_size.height()
                 # 确保有最新的预览水印尺寸（若为空则先请求一次）
                 if self._wm_prev_pix.isNull():
                     self.requestPreviewWatermark.emit()
@@ -299,8 +805,8 @@ class PreviewLabel(QLabel):
 
             # 当前 pos 比例，换算为像素（以原图）
             st = self.main.settings
-            base_w = self._base_image.width()
-            base_h = self._base_image.height()
+            base_w = self._base_size.width()
+            base_h = self._base_size.height()
             wm = self._wm_prev_pix
             wm_w = wm.width() / self._scale_factor  # 转回原图像素
             wm_h = wm.height() / self._scale_factor
@@ -314,15 +820,19 @@ class PreviewLabel(QLabel):
             x_px = x_ratio * base_w + dx_img
             y_px = y_ratio * base_h + dy_img
 
-            # 限制不超出图像边界
-            x_px = clamp(x_px, 0, max(0, base_w - wm_w))
-            y_px = clamp(y_px, 0, max(0, base_h - wm_h))
+            # 限制不超出图像边界（拖拽热路径，内联比较代替 clamp 调用）
+            max_x = base_w - wm_w if base_w > wm_w else 0
+            max_y = base_h - wm_h if base_h > wm_h else 0
+            x_px = 0.0 if x_px < 0 else (max_x if x_px > max_x else x_px)
+            y_px = 0.0 if y_px < 0 else (max_y if y_px > max_y else y_px)
 
             x_ratio = x_px / base_w if base_w > 0 else 0
             y_ratio = y_px / base_h if base_h > 0 else 0
 
+            # 底图不变，只让新旧水印矩形的并集失效
+            old_rect = self._wm_rect()
             self.positionChanged.emit(x_ratio, y_ratio)
-            self.update()
+            self.update(old_rect.united(self._wm_rect()))
             e.accept()
         else:
             super().mouseMoveEvent(e)
@@ -330,6 +840,7 @@ class PreviewLabel(QLabel):
     def mouseReleaseEvent(self, e):
         if e.button() == Qt.LeftButton and self._dragging:
             self._dragging = False
+            self._hq_timer.start(120)
             e.accept()
         else:
             super().mouseReleaseEvent(e)
@@ -397,31 +908,16 @@ class ThumbnailList(QListWidget):
         if not md.hasUrls():
             return False
         for u in md.urls():
-            p = Path(u.toLocalFile())
+            f = u.toLocalFile()
+            p = Path(f)
             if p.is_dir():
                 return True
-            if p.is_file() and p.suffix.lower() in SUPPORTED_EXTS:
+            if f.lower().endswith(SUPPORTED_EXTS_TUPLE) and p.is_file():
                 return True
         return False
 
     def _extract_paths(self, e) -> list:
-        md = e.mimeData()
-        if not md.hasUrls():
-            return []
-        paths = []
-        for u in md.urls():
-            p = Path(u.toLocalFile())
-            if not p.exists():
-                continue
-            if p.is_file() and p.suffix.lower() in SUPPORTED_EXTS:
-                paths.append(str(p))
-            elif p.is_dir():
-                # 仅扫描一层
-                for name in os.listdir(p):
-                    f = p / name
-                    if f.is_file() and f.suffix.lower() in SUPPORTED_EXTS:
-                        paths.append(str(f))
-        return paths
+        return dropped_image_paths(e.mimeData())
 
     # 空态提示：列表为空时居中画字
     def paintEvent(self, event):
@@ -443,12 +939,41 @@ class MainWindow(QMainWindow):
         self.setWindowTitle(APP_NAME)
         self.resize(1260, 760)
         QApplication.setApplicationDisplayName(APP_NAME)
+        QPixmapCache.setCacheLimit(131072)  # KB，约 128 MB 的预览缩放缓存
+        # 解码/缩略图为 CPU 密集型且在 C++ 中执行，线程数与核数一致
+        QThreadPool.globalInstance().setMaxThreadCount(os.cpu_count() or 1)
+        self._export_job = None  # 进行中的批量导出状态
+        self._current_export_pending = False  # “导出当前”是否仍在线程池中执行
 
         # 状态
-        self.settings = default_settings()
-        self.images = []  # [{"path":str, "img":QImage, "w":int, "h":int}]
+        self._defaults = default_settings()  # 内置默认值：会话文件按它存差异、读时以它为底
+        self.settings = copy.deepcopy(self._defaults)
+        self._refresh_wm_key()
+        # 条目只保存路径、尺寸与列表项；预览图放在容量很小的 LRU 中，不随导入数量增长
+        self.images = []  # [{"path":str, "item":QListWidgetItem, "has_thumb":bool, "w":int, "h":int, ...}]
+        self._image_paths = set()  # 已导入路径（normcase + abspath），用于 O(1) 查重
+        self._preview_lru = OrderedDict()  # path -> 预览 QImage
         self.current_index = -1
-        self._wm_cache_for_export = {}  # (base_size_tuple)->QImage 缓存
+        # 后台解码：path -> 尚未拿到预览图/缩略图的条目
+        self._decode_pending = {}
+        self._placeholder_icon = None
+        self._anchor_btn_state = None  # 九宫格按钮当前高亮的 anchor
+        # 预览刷新节流：滑块拖动每秒上百次信号，设置同步写入，重绘合并为每帧（约 60Hz）最多一次
+        self._preview_timer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.setInterval(16)
+        self._preview_timer.timeout.connect(self._do_update_preview)
+        # 会话自动保存：设置变化后空闲 500ms 再写一次 last_session，连续拖动只落盘一次
+        self._autosave_timer = QTimer(self)
+        self._autosave_timer.setSingleShot(True)
+        self._autosave_timer.setInterval(500)
+        self._autosave_timer.timeout.connect(self._autosave)
+        self._default_family = QFont().family()  # 设置中未指定字体时的回退字族
+        self._wm_cache = OrderedDict()  # 未旋转水印的 LRU：(WM_BUILD_FIELDS 取值, 比例) -> QImage
+        # 水印缓存：水印设置 -> 已旋转的原尺寸 QImage；(水印设置, 原图尺寸, 预览比例, 是否平滑) -> 预览 QPixmap
+        self._wm_img_cache = lru_cache(maxsize=8)(self._render_wm_image)
+        self._wm_pix_cache = lru_cache(maxsize=16)(self._render_wm_pixmap)
+        self._interacting = False  # 正在拖动水印相关滑块：预览水印用快速插值旋转，松开后再平滑
 
         # UI
         self._build_ui()
@@ -460,6 +985,10 @@ class MainWindow(QMainWindow):
         # 禁用所有控件的鼠标滚轮操作
         self.setWheelEventForControls()
 
+        for slider in (self.slider_opacity, self.slider_img_scale, self.slider_img_opacity, self.slider_rot):
+            slider.sliderPressed.connect(self._begin_interaction)
+            slider.sliderReleased.connect(self._end_interaction)
+
     # ---------- UI ----------
     def _wrap_scroll(self, w: QWidget) -> QScrollArea:
         sa = QScrollArea()
@@ -482,6 +1011,10 @@ class MainWindow(QMainWindow):
         self.list.setSelectionMode(QAbstractItemView.SingleSelection)
         self.list.itemSelectionChanged.connect(self.on_list_selection)
         self.list.setSpacing(8)
+        # 缩略图尺寸一致：统一项尺寸，免得滚动/布局时逐项询问 sizeHint；大批量导入时分批布局
+        self.list.setUniformItemSizes(True)
+        self.list.setLayoutMode(QListWidget.Batched)
+        self.list.setBatchSize(50)
         self.list.setStyleSheet(
             "QListWidget{background:#1f1f1f; color:#ddd;} "
             "QListWidget::item{ border:1px solid #333; } "
@@ -818,6 +1351,7 @@ class MainWindow(QMainWindow):
         # 中部：模板列表（更大、更美观）
         self.template_list = QListWidget()
         self.template_list.setSpacing(8)
+        self.template_list.setUniformItemSizes(True)  # 单行文本项，高度一致
         self.template_list.setAlternatingRowColors(False)
         self.template_list.setSelectionMode(QAbstractItemView.SingleSelection)
         self.template_list.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
@@ -921,29 +1455,18 @@ class MainWindow(QMainWindow):
         QApplication.setStyle("Fusion")
 
         pal = self.palette()
-
-        pal.setColor(QPalette.Window, QColor(30, 30, 30))
-        pal.setColor(QPalette.WindowText, Qt.white)
-        pal.setColor(QPalette.Base, QColor(25, 25, 25))
-        pal.setColor(QPalette.AlternateBase, QColor(45, 45, 45))
-        pal.setColor(QPalette.ToolTipBase, Qt.white)
-        pal.setColor(QPalette.ToolTipText, Qt.white)
-        pal.setColor(QPalette.Text, Qt.white)
-        pal.setColor(QPalette.Button, QColor(45, 45, 45))
-        pal.setColor(QPalette.ButtonText, Qt.white)
-        pal.setColor(QPalette.BrightText, Qt.red)
-        pal.setColor(QPalette.Highlight, QColor(80, 130, 190))
-        pal.setColor(QPalette.HighlightedText, Qt.white)
-
+        for role, color in DARK_PALETTE:
+            pal.setColor(role, color)
         self.setPalette(pal)
 
 
     # ---------- 事件 ----------
     def closeEvent(self, e):
+        self._autosave_timer.stop()
         try:
             self.save_last_session()
-        except Exception:
-            pass
+        except Exception as e:
+            print(f"自动保存会话失败: {e}")
         super().closeEvent(e)
 
     # ===== 窗口级拖拽兜底：把文件/文件夹拖到窗口任意处都能导入 =====
@@ -974,34 +1497,16 @@ class MainWindow(QMainWindow):
         if not md.hasUrls():
             return False
         for u in md.urls():
-            p = Path(u.toLocalFile())
+            f = u.toLocalFile()
+            p = Path(f)
             if p.is_dir():
                 return True
-            if p.is_file() and p.suffix.lower() in SUPPORTED_EXTS:
+            if f.lower().endswith(SUPPORTED_EXTS_TUPLE) and p.is_file():
                 return True
         return False
 
     def _dnd_extract_paths(self, e) -> list[str]:
-        md = e.mimeData()
-        if not md.hasUrls():
-            return []
-        paths = []
-        for u in md.urls():
-            p = Path(u.toLocalFile())
-            if not p.exists():
-                continue
-            if p.is_file() and p.suffix.lower() in SUPPORTED_EXTS:
-                paths.append(str(p))
-            elif p.is_dir():
-                # 仅扫描一层
-                try:
-                    for name in os.listdir(p):
-                        f = p / name
-                        if f.is_file() and f.suffix.lower() in SUPPORTED_EXTS:
-                            paths.append(str(f))
-                except Exception:
-                    pass
-        return paths
+        return dropped_image_paths(e.mimeData())
 
     # ---------- 业务 ----------
     def action_import_files(self):
@@ -1015,37 +1520,61 @@ class MainWindow(QMainWindow):
         d = QFileDialog.getExistingDirectory(self, "选择文件夹")
         if not d:
             return
-        paths = []
-        for name in os.listdir(d):
-            p = Path(d) / name
-            if p.is_file() and p.suffix.lower() in SUPPORTED_EXTS:
-                paths.append(str(p))
+        paths = scan_image_dir(d)
         if paths:
             self.add_images(paths)
 
     def action_clear_list(self):
+        # 尚未返回的解码结果一律丢弃
+        self._decode_pending.clear()
+        self._preview_lru.clear()
+        self._image_paths.clear()
         self.images.clear()
         self.list.clear()
         self.preview.setImage(QImage(), "")
         self.current_index = -1
         self.statusBar().showMessage("已清空列表")
 
+    def placeholder_icon(self) -> QIcon:
+        if self._placeholder_icon is None:
+            pm = QPixmap(112, 84)
+            pm.fill(QColor(60, 60, 60))
+            self._placeholder_icon = QIcon(pm)
+        return self._placeholder_icon
+
     def add_images(self, paths):
         added = 0
+        dpr = self.devicePixelRatioF()
         for p in paths:
+            # 不再单独 exists()：文件不存在/不可读时下面读文件头或 stat 会失败，直接跳过
+            if not str(p).lower().endswith(SUPPORTED_EXTS_TUPLE):
+                continue
             path = Path(p)
-            if not path.exists() or path.suffix.lower() not in SUPPORTED_EXTS:
+            path_key = os.path.normcase(os.path.abspath(p))
+            if path_key in self._image_paths:
                 continue
-            if any(img["path"] == str(path) for img in self.images):
+            # 只读文件头拿尺寸，像素解码交给线程池，先用占位图标入列
+            size = QImageReader(str(path)).size()
+            if not size.isValid():
                 continue
-            img = QImage(str(path))
-            if img.isNull():
+            try:
+                mtime = path.stat().st_mtime_ns
+            except OSError:
                 continue
-            self.images.append({"path": str(path), "img": img, "w": img.width(), "h": img.height()})
-            item = QListWidgetItem(QIcon(QPixmap.fromImage(img).scaled(112,84, Qt.KeepAspectRatio, Qt.SmoothTransformation)),
-                                   path.name)
+            # 缩略图按 (路径, 修改时间, 尺寸) 进 QPixmapCache：重复导入同一批文件无需再解码
+            thumb_key = f"wm_thumb::{path}::{mtime}::112x84@{dpr}"
+            thumb = QPixmapCache.find(thumb_key)
+            cached = thumb is not None and not thumb.isNull()
+            item = QListWidgetItem(QIcon(thumb) if cached else self.placeholder_icon(), path.name)
             item.setToolTip(str(path))
+            entry = {"path": str(path), "item": item, "thumb_key": thumb_key, "has_thumb": cached,
+                     "dpr": dpr, "failed": False, "w": size.width(), "h": size.height()}
+            self.images.append(entry)
+            self._image_paths.add(path_key)
             self.list.addItem(item)
+            if not cached:
+                # 导入阶段只要缩略图；预览图在选中时再解码
+                self._queue_decode(entry, with_preview=False)
             added += 1
 
         if added > 0 and self.current_index == -1:
@@ -1053,19 +1582,64 @@ class MainWindow(QMainWindow):
 
         self.statusBar().showMessage(f"已导入 {added} 张图片（总计 {len(self.images)}）")
 
+    def _queue_decode(self, entry: dict, with_preview=True):
+        self._decode_pending[entry["path"]] = entry
+        worker = DecodeWorker(entry["path"], entry["dpr"], with_preview, not entry["has_thumb"])
+        worker.signals.decoded.connect(self._on_image_decoded)
+        QThreadPool.globalInstance().start(worker)
+
+    def _remember_preview(self, path: str, img: QImage):
+        self._preview_lru[path] = img
+        self._preview_lru.move_to_end(path)
+        while len(self._preview_lru) > PREVIEW_LRU_SIZE:
+            self._preview_lru.popitem(last=False)
+
+    def _get_preview(self, path: str):
+        img = self._preview_lru.get(path)
+        if img is not None:
+            self._preview_lru.move_to_end(path)
+        return img
+
+    def _on_image_decoded(self, path: str, ok: bool, preview_img: QImage, thumb: QImage):
+        entry = self._decode_pending.pop(path, None)
+        if entry is None:
+            return  # 列表已清空
+        if not ok:
+            entry["failed"] = True
+            entry["item"].setText(f"{Path(path).name}（读取失败）")
+            return
+        if not thumb.isNull():
+            pm = QPixmap.fromImage(thumb)
+            QPixmapCache.insert(entry["thumb_key"], pm)
+            entry["item"].setIcon(QIcon(pm))
+            entry["has_thumb"] = True
+        if not preview_img.isNull():
+            self._remember_preview(path, preview_img)
+        # 当前选中项刚解码完成：补上预览
+        if 0 <= self.current_index < len(self.images) and self.images[self.current_index] is entry:
+            self.on_list_selection()
+
     def on_list_selection(self):
         row = self.list.currentRow()
         if row < 0 or row >= len(self.images):
             return
         self.current_index = row
         data = self.images[row]
-        self.preview.setImage(data["img"], data["path"])
+        # 预览图按需解码：不在 LRU 中且没有进行中的解码时提交一次
+        preview_img = self._get_preview(data["path"])
+        if preview_img is None and not data["failed"] and data["path"] not in self._decode_pending:
+            self._queue_decode(data)
+        # 预览图尚未解码完成时先显示空态，解码回调里会再次刷新
+        self.preview.setImage(preview_img if preview_img is not None else QImage(),
+                              data["path"], QSize(data["w"], data["h"]))
         # 切换预览时刷新九宫格高亮
         self.update_anchor_buttons()
 
     def on_type_changed(self):
         typ = "text" if self.combo_type.currentIndex() == 0 else "image"
         self.settings["watermark_type"] = typ
+        self._refresh_wm_key()
+        self._autosave_timer.start()
         self.gb_text.setVisible(typ == "text")
         self.gb_image.setVisible(typ == "image")
         self.update_preview()
@@ -1094,6 +1668,8 @@ class MainWindow(QMainWindow):
 
         # 旋转
         self.settings["rotation_deg"] = self.slider_rot.value()
+        self._refresh_wm_key()
+        self._autosave_timer.start()
 
         # 导出
         ex = self.settings["export"]
@@ -1119,6 +1695,8 @@ class MainWindow(QMainWindow):
         f, _ = QFileDialog.getOpenFileName(self, "选择水印图片（建议PNG透明）", "", "Images (*.png *.jpg *.jpeg *.bmp *.tif *.tiff)")
         if f:
             self.settings["image_path"] = f
+            self._refresh_wm_key()
+            self._autosave_timer.start()
             self.lbl_wm_img.setText(Path(f).name)
             self.update_preview()
 
@@ -1134,8 +1712,8 @@ class MainWindow(QMainWindow):
 
         # 2) 将当前锚点对应的“实际显示位置”同步为自定义比例坐标（为下一次拖拽做准备）
         if 0 <= self.current_index < len(self.images):
-            base_img = self.images[self.current_index]["img"]
-            bw, bh = base_img.width(), base_img.height()
+            data = self.images[self.current_index]
+            bw, bh = data["w"], data["h"]
             if bw > 0 and bh > 0:
                 # 使用当前基图尺寸与当前水印尺寸计算左上角位置（原图坐标系）
                 x_px, y_px = self.calc_anchor_top_left(key, bw, bh)
@@ -1145,10 +1723,14 @@ class MainWindow(QMainWindow):
 
         self.update_anchor_buttons()
         self.update_preview()
+        self._autosave_timer.start()
 
 
     def update_anchor_buttons(self):
         cur = self.settings.get("anchor", "custom")
+        if cur == self._anchor_btn_state:
+            return  # 高亮未变化，跳过 9 次 setStyleSheet
+        self._anchor_btn_state = cur
         for k, b in self.grid_btns.items():
             b.setStyleSheet("QToolButton{background:#444;} QToolButton:hover{background:#555;}")
             if k == cur:
@@ -1157,13 +1739,18 @@ class MainWindow(QMainWindow):
     def on_preview_pos_changed(self, x_ratio, y_ratio):
         self.settings["pos_ratio_x"] = float(x_ratio)
         self.settings["pos_ratio_y"] = float(y_ratio)
-        # 拖拽后即处于 custom
+        # 拖拽后即处于 custom；水印像素不变，重绘由预览控件按脏矩形自行发起
         self.settings["anchor"] = "custom"
         self.update_anchor_buttons()
-        self.update_preview()
+        self._autosave_timer.start()
 
     # ---------- 预览绘制 ----------
     def update_preview(self):
+        # 已排定的刷新不再推迟：持续拖动时也按帧率出图，而不是等停手后才刷新
+        if not self._preview_timer.isActive():
+            self._preview_timer.start()
+
+    def _do_update_preview(self):
         # 在重绘前，先更新一次水印缓存，避免 paintEvent 里再触发计算
         self.update_preview_watermark()
         self.preview.update()
@@ -1174,86 +1761,153 @@ class MainWindow(QMainWindow):
             self.preview.setPreviewWatermarkPixmap(QPixmap())
             return
         data = self.images[self.current_index]
-        base_img: QImage = data["img"]
-        base_w, base_h = base_img.width(), base_img.height()
+        base_w, base_h = data["w"], data["h"]
         if base_w == 0 or base_h == 0:
             self.preview.setPreviewWatermarkPixmap(QPixmap()); return
 
-        # 先生成“原图尺寸语义”的水印图像（用于导出），再按预览比例缩放
-        wm_img = self.build_watermark_image_for_base(base_w, base_h)
-        if wm_img.isNull():
-            self.preview.setPreviewWatermarkPixmap(QPixmap()); return
+        key = self.wm_settings_key() + (base_w, base_h)
+        self.preview.setPreviewWatermarkPixmap(
+            self._wm_pix_cache(key, self.preview._scale_factor, not self._interacting))
 
-        # 应用旋转
-        wm_img = self.apply_rotation(wm_img, self.settings["rotation_deg"])
+    def _begin_interaction(self):
+        self._interacting = True
 
-        # 缩放到预览比例
-        scale = self.preview._scale_factor
-        prev_pm = QPixmap.fromImage(wm_img).scaled(
-            int(wm_img.width() * scale),
-            int(wm_img.height() * scale),
-            Qt.KeepAspectRatio,
-            Qt.SmoothTransformation
-        )
-        self.preview.setPreviewWatermarkPixmap(prev_pm)
+    def _end_interaction(self):
+        # 松开滑块后补一次平滑缩放的刷新
+        self._interacting = False
+        self.update_preview()
+
+    def wm_settings_key(self) -> tuple:
+        return self._wm_key
+
+    def _refresh_wm_key(self):
+        """水印相关设置写入后调用：键只在设置变化时生成一次，预览/导出直接复用。
+        用完整元组而非 hash 值作键，避免哈希碰撞取到别的水印。"""
+        self._wm_key = tuple(self.settings.get(k) for k in WM_KEY_FIELDS)
+
+    # 以下两个渲染函数的 key 均由当前 settings 生成，仅在缓存未命中时调用，因此直接按当前 settings 绘制
+    def _render_wm_image(self, key: tuple) -> QImage:
+        # 先生成“原图尺寸语义”的水印图像，旋转只在这里做一次
+        wm_img = self.build_watermark_image_for_base(0, 0)
+        return self.apply_rotation(wm_img, self.settings.get("rotation_deg", 0))
+
+    def _render_wm_pixmap(self, key: tuple, scale: float, smooth: bool = True) -> QPixmap:
+        # 直接按预览比例生成水印（文字矢量直出、图片一次缩放到位），不再先画原尺寸再重采样一遍
+        wm_img = self.build_watermark_image_for_base(0, 0, scale)
+        if wm_img.isNull():
+            return QPixmap()
+        return QPixmap.fromImage(self.apply_rotation(wm_img, self.settings.get("rotation_deg", 0), smooth))
+
+    def build_watermark_image_for_base(self, base_w: int, base_h: int, scale: float = 1.0) -> QImage:
+        """根据当前设置，基于“原图尺寸概念”生成（未旋转的）水印图像（透明背景）；scale 为预览比例，导出时为 1。
+        结果只取决于 WM_BUILD_FIELDS 与 scale（与底图尺寸无关），按其取值缓存；只拖动旋转滑块时不再重绘文字。"""
+        # WM_KEY_FIELDS 去掉末尾的 rotation_deg 即 WM_BUILD_FIELDS
+        key = self._wm_key[:-1] + (scale,)
+        img = self._wm_cache.get(key)
+        if img is not None:
+            self._wm_cache.move_to_end(key)
+            return img
+        img = self._build_watermark_image(scale)
+        self._wm_cache[key] = img
+        if len(self._wm_cache) > WM_CACHE_SIZE:
+            self._wm_cache.popitem(last=False)
+        return img
+
+    def _text_layout(self):
+        """文本水印的字体与画布几何，测量与绘制共用；无文本时返回 None。
+        返回 (font, text, text_rect, pad, dx, dy, outline_px, canvas_size)"""
+        text = self.settings.get("text", "").strip()
+        if not text:
+            return None
+        font_key = (self.settings.get("font_family") or self._default_family,
+                    int(self.settings.get("font_px", 48)),
+                    bool(self.settings.get("bold", False)),
+                    bool(self.settings.get("italic", False)))
+        font = make_font(*font_key)
+
+        # 直接用（缓存的）字体度量测量文本尺寸，无需开画布
+        text_rect = font_metrics(*font_key).tightBoundingRect(text)
+
+        # 紧凑画布：字形包围盒 + 描边半宽与抗锯齿余量 + 阴影偏移
+        outline_px = int(self.settings.get("outline_px", 2)) if self.settings.get("outline", True) else 0
+        dx = dy = 0
+        if self.settings.get("shadow", True):
+            dx = int(self.settings.get("shadow_dx", 2))
+            dy = int(self.settings.get("shadow_dy", 2))
+        pad = (outline_px + 1) // 2 + 2
+        size = QSize(max(2, text_rect.width() + 2 * pad + abs(dx)),
+                     max(2, text_rect.height() + 2 * pad + abs(dy)))
+        return font, text, text_rect, pad, dx, dy, outline_px, size
+
+    def _watermark_size_for_base(self, base_w: int, base_h: int) -> QSize:
+        """只计算（已旋转）水印的尺寸：文本只测量、图片只读文件头，不做任何绘制"""
+        if self.settings.get("watermark_type", "text") == "text":
+            layout = self._text_layout()
+            if layout is None:
+                return QSize(0, 0)
+            size = layout[-1]
+        else:
+            path = self.settings.get("image_path", "")
+            src_size = QImageReader(path).size() if path else QSize()
+            if not src_size.isValid():
+                return QSize(0, 0)
+            scale_percent = clamp(self.settings.get("image_scale_percent", 40), 1, 1000)
+            new_w = max(1, int(src_size.width() * scale_percent / 100.0))
+            new_h = max(1, int(src_size.height() * scale_percent / 100.0))
+            size = src_size.scaled(new_w, new_h, Qt.KeepAspectRatio)
+
+        deg = self.settings.get("rotation_deg", 0)
+        if deg % 360 == 0:
+            return size
+        # 旋转后的包围盒按解析方式求出，与 QImage.transformed 的取整规则一致
+        return QTransform().rotate(deg).mapRect(QRectF(0, 0, size.width(), size.height())).toAlignedRect().size()
 
-    def build_watermark_image_for_base(self, base_w: int, base_h: int) -> QImage:
-        """根据当前设置，基于“原图尺寸概念”生成水印图像（透明背景），供导出与预览二次缩放使用"""
+    def _build_watermark_image(self, scale: float = 1.0) -> QImage:
         typ = self.settings.get("watermark_type", "text")
         if typ == "text":
-            text = self.settings.get("text", "").strip()
-            if not text:
+            layout = self._text_layout()
+            if layout is None:
                 return QImage()
-            font = QFont(self.settings.get("font_family", QFont().family()))
-            font.setPixelSize(int(self.settings.get("font_px", 48)))
-            font.setBold(bool(self.settings.get("bold", False)))
-            font.setItalic(bool(self.settings.get("italic", False)))
-
-            # 先用临时画布测量文本尺寸
-            tmp = QImage(2,2, QImage.Format_ARGB32_Premultiplied); tmp.fill(Qt.transparent)
-            p = QPainter(tmp); p.setFont(font)
-            metrics = p.fontMetrics()
-            text_rect = metrics.boundingRect(text)
-            p.end()
-
-            w = max(2, text_rect.width() + 8)
-            h = max(2, text_rect.height() + 8)
-            img = QImage(w, h, QImage.Format_ARGB32_Premultiplied)
+            font, text, text_rect, pad, dx, dy, outline_px, size = layout
+            if scale != 1.0:
+                size = QSize(max(1, math.ceil(size.width() * scale)), max(1, math.ceil(size.height() * scale)))
+            img = QImage(size, QImage.Format_ARGB32_Premultiplied)
             img.fill(Qt.transparent)
             p = QPainter(img)
-            p.setRenderHints(QPainter.Antialiasing | QPainter.TextAntialiasing | QPainter.SmoothPixmapTransform)
-            p.setFont(font)
+            p.setRenderHint(QPainter.Antialiasing)
+            # 按原尺寸排版、经变换缩放后栅格化：预览与导出的字形比例一致，不受小字号微调（hinting）影响
+            p.scale(scale, scale)
+            tc = QColor(self.settings.get("text_color", "#FFFFFF"))
+            opacity = clamp(self.settings.get("opacity", 70) / 100.0, 0.0, 1.0)
+            fill = QColor(tc.red(), tc.green(), tc.blue(), int(255 * opacity))
+            # tightBoundingRect 以基线原点为参照
+            origin = QPointF(pad - text_rect.left() + max(0, -dx), pad - text_rect.top() + max(0, -dy))
+
+            if not self.settings.get("outline", True) and not self.settings.get("shadow", True):
+                # 无描边/阴影：drawText 走字形缓存，比路径填充快得多
+                p.setPen(fill)
+                p.setFont(font)
+                p.drawText(origin, text)
+                p.end()
+                return img
 
             # 构造文本路径更易实现描边
             path = QPainterPath()
-            baseline = metrics.ascent() + 4  # 微调基线
-            path.addText(4, baseline, font, text)
+            path.addText(origin, font, text)
 
+            # 同一画布、同一路径上依次 fillPath/strokePath，不再来回切换画笔与画刷状态
             # 阴影
             if self.settings.get("shadow", True):
-                dx = int(self.settings.get("shadow_dx", 2))
-                dy = int(self.settings.get("shadow_dy", 2))
                 shadow_color = QColor(self.settings.get("shadow_color", "#80000000"))
-                p.setPen(Qt.NoPen)
-                p.setBrush(shadow_color)
-                p.drawPath(path.translated(dx, dy))
+                p.fillPath(path.translated(dx, dy), shadow_color)
 
             # 描边
             if self.settings.get("outline", True):
-                outline_px = int(self.settings.get("outline_px", 2))
                 outline_color = QColor(self.settings.get("outline_color", "#000000"))
-                pen = QPen(outline_color, outline_px, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
-                p.setPen(pen)
-                p.setBrush(Qt.NoBrush)
-                p.drawPath(path)
+                p.strokePath(path, QPen(outline_color, outline_px, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
 
             # 填充
-            tc = QColor(self.settings.get("text_color", "#FFFFFF"))
-            opacity = clamp(self.settings.get("opacity", 70) / 100.0, 0.0, 1.0)
-            fill = QColor(tc.red(), tc.green(), tc.blue(), int(255 * opacity))
-            p.setPen(Qt.NoPen)
-            p.setBrush(fill)
-            p.drawPath(path)
+            p.fillPath(path, fill)
             p.end()
             return img
 
@@ -1266,8 +1920,8 @@ class MainWindow(QMainWindow):
                 return QImage()
             # 缩放（相对原始水印）
             scale_percent = clamp(self.settings.get("image_scale_percent", 40), 1, 1000)
-            new_w = max(1, int(src.width() * scale_percent / 100.0))
-            new_h = max(1, int(src.height() * scale_percent / 100.0))
+            new_w = max(1, int(src.width() * scale_percent / 100.0 * scale))
+            new_h = max(1, int(src.height() * scale_percent / 100.0 * scale))
             scaled = src.scaled(new_w, new_h, Qt.KeepAspectRatio, Qt.SmoothTransformation)
 
             # 透明度
@@ -1284,13 +1938,12 @@ class MainWindow(QMainWindow):
                 scaled = tmp
             return scaled
 
-    def apply_rotation(self, img: QImage, deg: int) -> QImage:
+    def apply_rotation(self, img: QImage, deg: int, smooth: bool = True) -> QImage:
         if img.isNull() or deg % 360 == 0:
             return img
-        pm = QPixmap.fromImage(img)
-        tr = QTransform().rotate(deg)
-        pm2 = pm.transformed(tr, Qt.SmoothTransformation)
-        return pm2.toImage()
+        # 直接在 QImage 上变换，省去 QPixmap 往返；90° 的整数倍是无损的像素重排，无需插值
+        mode = Qt.SmoothTransformation if smooth and deg % 90 != 0 else Qt.FastTransformation
+        return img.transformed(QTransform().rotate(deg), mode)
 
     # anchor 计算：返回针对“原图坐标系”的左上角像素
     def calc_anchor_top_left(self, anchor: str, base_w: int, base_h: int,
@@ -1300,34 +1953,11 @@ class MainWindow(QMainWindow):
             wm_w = wm_preview_size.width() / self.preview._scale_factor
             wm_h = wm_preview_size.height() / self.preview._scale_factor
         else:
-            wm = self.build_watermark_image_for_base(base_w, base_h)
-            wm = self.apply_rotation(wm, self.settings.get("rotation_deg", 0))
-            wm_w, wm_h = wm.width(), wm.height()
-
-        margin = 12  # 像素
-        if anchor == "tl":
-            x = margin; y = margin
-        elif anchor == "tc":
-            x = (base_w - wm_w)/2; y = margin
-        elif anchor == "tr":
-            x = base_w - wm_w - margin; y = margin
-        elif anchor == "cl":
-            x = margin; y = (base_h - wm_h)/2
-        elif anchor == "cc":
-            x = (base_w - wm_w)/2; y = (base_h - wm_h)/2
-        elif anchor == "cr":
-            x = base_w - wm_w - margin; y = (base_h - wm_h)/2
-        elif anchor == "bl":
-            x = margin; y = base_h - wm_h - margin
-        elif anchor == "bc":
-            x = (base_w - wm_w)/2; y = base_h - wm_h - margin
-        elif anchor == "br":
-            x = base_w - wm_w - margin; y = base_h - wm_h - margin
-        else:
-            # custom
-            x = float(self.settings.get("pos_ratio_x", 0.5)) * base_w
-            y = float(self.settings.get("pos_ratio_y", 0.5)) * base_h
-        return int(x), int(y)
+            size = self._watermark_size_for_base(base_w, base_h)
+            wm_w, wm_h = size.width(), size.height()
+
+        pos_ratio = (self.settings.get("pos_ratio_x", 0.5), self.settings.get("pos_ratio_y", 0.5))
+        return anchor_top_left(anchor, base_w, base_h, wm_w, wm_h, pos_ratio)
 
     # ---------- 导出 ----------
     def ensure_outdir_valid(self, src_path: str) -> tuple[bool, str]:
@@ -1361,24 +1991,16 @@ class MainWindow(QMainWindow):
             ext = "jpg"
         return newname + "." + ext
 
-    def compute_export_size(self, w: int, h: int) -> tuple[int, int]:
-        ex = self.settings["export"]
-        mode = ex.get("resize_mode", "none")
-        val = int(ex.get("resize_value", 100))
-        if mode == "width":
-            nw = max(1, val)
-            nh = max(1, int(h * nw / w))
-        elif mode == "height":
-            nh = max(1, val)
-            nw = max(1, int(w * nh / h))
-        elif mode == "percent":
-            nw = max(1, int(w * val / 100.0))
-            nh = max(1, int(h * val / 100.0))
-        else:
-            nw, nh = w, h
-        return nw, nh
+    def _export_busy(self) -> bool:
+        """已有导出在进行时拒绝再次开始，避免多个任务同时写同一输出文件"""
+        if self._export_job is None and not self._current_export_pending:
+            return False
+        self.statusBar().showMessage("已有导出正在进行，请等待完成。")
+        return True
 
     def export_current(self):
+        if self._export_busy():
+            return
         if self.current_index < 0 or self.current_index >= len(self.images):
             QMessageBox.warning(self, "提示", "请先导入并选择一张图片。")
             return
@@ -1390,12 +2012,26 @@ class MainWindow(QMainWindow):
         outdir = Path(self.settings["export"]["output_dir"])
         fn = self.make_output_name(src)
         outpath = outdir / fn
-        try:
-            self.export_one(src, outpath)
+        # 解码/合成/编码写盘都放到线程池，界面不因磁盘写入卡住；结果经信号回到主线程
+        signals = ExportSignals(self)
+        signals.exported.connect(
+            lambda path, ok, err: self._on_current_exported(outpath, ok, err, signals))
+        self.statusBar().showMessage(f"正在导出：{human_path(outpath)}")
+        self._current_export_pending = True
+        wm = self.build_export_watermark()
+        QThreadPool.globalInstance().start(ExportWorker(
+            src, outpath, copy.deepcopy(self.settings), wm,
+            signals, threading.Event(), export_watermark_pil(wm)))
+
+    def _on_current_exported(self, outpath: Path, ok: bool, err: str, signals: ExportSignals):
+        self._current_export_pending = False
+        signals.deleteLater()
+        if ok:
             self.statusBar().showMessage(f"导出成功：{human_path(outpath)}")
             QMessageBox.information(self, "成功", f"已导出：{human_path(outpath)}")
-        except Exception as e:
-            QMessageBox.critical(self, "导出失败", str(e))
+        else:
+            self.statusBar().clearMessage()
+            QMessageBox.critical(self, "导出失败", err)
 
     def export_all(self):
         if not self.images:
@@ -1409,96 +2045,62 @@ class MainWindow(QMainWindow):
         outdir = Path(self.settings["export"]["output_dir"])
         N = len(self.images)
 
+        if self._export_busy():
+            return
         prog = QProgressDialog("正在批量导出...", "取消", 0, N, self)
         prog.setWindowModality(Qt.WindowModal)
         prog.setMinimumDuration(400)
 
-        success = 0
-        for i, data in enumerate(self.images, start=1):
-            if prog.wasCanceled():
-                break
-            prog.setValue(i-1)
+        # 设置快照 + 水印只生成一次，工作线程只读共享
+        settings = copy.deepcopy(self.settings)
+        wm = self.build_export_watermark()
+
+        # Qt 的解码/缩放/编码在 C++ 中执行并释放 GIL，线程池即可按核数并行；进度经信号回到主线程
+        signals = ExportSignals(self)
+        signals.exported.connect(self._on_image_exported)
+        job = {"total": N, "done": 0, "success": 0, "prog": prog,
+               "signals": signals, "cancel": threading.Event()}
+        # 未开始的任务见到取消标记即跳过，已在执行的照常完成
+        prog.canceled.connect(job["cancel"].set)
+        self._export_job = job
+        wm_pil = export_watermark_pil(wm)  # Pillow 导出时整批只转换一次
+        pool = QThreadPool.globalInstance()
+        for data in self.images:
             src = data["path"]
-            outname = self.make_output_name(src)
-            outpath = outdir / outname
-            try:
-                self.export_one(src, outpath)
-                success += 1
-            except Exception as e:
-                # 遇错继续
-                print(f"导出失败: {src} -> {e}")
-            self.progress.setValue(int(i*100/N))
-            QApplication.processEvents()
-        prog.setValue(N)
-        QMessageBox.information(self, "批量完成", f"成功导出 {success} / {N} 张。")
-        self.statusBar().showMessage(f"成功导出 {success} / {N} 张。")
+            outpath = outdir / self.make_output_name(src)
+            pool.start(ExportWorker(src, outpath, settings, wm, signals, job["cancel"], wm_pil))
 
-    def export_one(self, src_path: str, out_path: Path):
-        base = QImage(src_path)
-        if base.isNull():
-            raise RuntimeError(f"无法读取图片：{src_path}")
-        # 尺寸调整
-        nw, nh = self.compute_export_size(base.width(), base.height())
-        if (nw, nh) != (base.width(), base.height()):
-            base = base.scaled(nw, nh, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-
-        # 构建“基于当前 base 尺寸”的水印图像
-        wm = self.build_watermark_image_for_base(base.width(), base.height())
-        wm = self.apply_rotation(wm, self.settings.get("rotation_deg", 0))
-        if wm.isNull():
-            # 若未设置水印，直接按导出格式保存
-            self.save_image(base, out_path)
+    def _on_image_exported(self, path: str, ok: bool, err: str):
+        job = self._export_job
+        if job is None:
             return
+        job["done"] += 1
+        if ok:
+            job["success"] += 1
+        elif not job["cancel"].is_set():
+            # 遇错继续
+            print(f"导出失败: {path} -> {err}")
+        done, N = job["done"], job["total"]
+        if not job["cancel"].is_set():
+            job["prog"].setValue(done)
+        self.progress.setValue(int(done*100/N))
+        if done < N:
+            return
+        self._export_job = None
+        job["prog"].close()
+        job["signals"].deleteLater()
+        success = job["success"]
+        QMessageBox.information(self, "批量完成", f"成功导出 {success} / {N} 张。")
+        self.statusBar().showMessage(f"成功导出 {success} / {N} 张。")
 
-        # 位置
-        anchor = self.settings.get("anchor", "custom")
-        if anchor != "custom":
-            x, y = self.calc_anchor_top_left(anchor, base.width(), base.height())
-        else:
-            x_ratio = float(self.settings.get("pos_ratio_x", 0.5))
-            y_ratio = float(self.settings.get("pos_ratio_y", 0.5))
-            # 注意：pos_ratio 是基于“原图”的，导出时我们已将 base 变为缩放后的，
-            # 但 pos_ratio 本质是相对比例，因此仍可直接乘以当前 base 尺寸
-            x = int(x_ratio * base.width())
-            y = int(y_ratio * base.height())
-
-            # 限制不越界
-            x = clamp(x, 0, max(0, base.width()-wm.width()))
-            y = clamp(y, 0, max(0, base.height()-wm.height()))
-
-        # 合成
-        out = QImage(base.size(), QImage.Format_ARGB32_Premultiplied)
-        out.fill(Qt.transparent)
-        p = QPainter(out)
-        p.setRenderHints(QPainter.Antialiasing | QPainter.SmoothPixmapTransform)
-        p.drawImage(0, 0, base)
-        p.drawImage(x, y, wm)
-        p.end()
-
-        self.save_image(out, out_path)
-
-    def save_image(self, img: QImage, out_path: Path):
-        fmt = self.settings["export"]["out_format"].upper()
-        if fmt == "JPEG":
-            # 透明背景合成白底（或可改为黑/自定义）
-            if img.hasAlphaChannel():
-                bg = QImage(img.size(), QImage.Format_RGB888)
-                bg.fill(Qt.white)
-                p = QPainter(bg)
-                p.drawImage(0, 0, img)
-                p.end()
-                img = bg
-            quality = int(self.settings["export"]["jpeg_quality"])
-            img.save(str(out_path), "JPEG", quality)
-        else:
-            # PNG 保持透明
-            img.save(str(out_path), "PNG")
+    def build_export_watermark(self) -> QImage:
+        """按当前设置生成导出用（已旋转）的水印；其尺寸不依赖底图，批量导出时共用一份"""
+        return self._wm_img_cache(self.wm_settings_key())
 
     # ---------- 模板 ----------
     def refresh_template_list(self):
         self.template_list.clear()
-        for f in sorted(templates_dir().glob("*.json")):
-            self.template_list.addItem(f.stem)
+        self.template_list.addItems(list_template_names())
 
     def template_save_as(self):
         """
@@ -1523,6 +2125,7 @@ class MainWindow(QMainWindow):
                 return
         try:
             self._save_settings_json(p)
+            invalidate_template_cache()
             self.refresh_template_list()
             QMessageBox.information(self, "成功", f"模板已保存：{p.name}")
         except Exception as e:
@@ -1567,6 +2170,7 @@ class MainWindow(QMainWindow):
         try:
             self._save_settings_json(p)
             QMessageBox.information(self, "成功", f"已设为默认模板：{p.name}")
+            invalidate_template_cache()
             self.refresh_template_list()
         except Exception as e:
             QMessageBox.critical(self, "错误", f"保存失败：{e}")
@@ -1593,23 +2197,51 @@ class MainWindow(QMainWindow):
         p = templates_dir() / f"{item.text()}.json"
         try:
             p.unlink(missing_ok=True)
+            invalidate_template_cache()
             self.refresh_template_list()
             QMessageBox.information(self, "成功", "模板已删除。")
         except Exception as e:
             QMessageBox.critical(self, "错误", f"删除失败：{e}")
 
     def _save_settings_json(self, p: Path):
-        with open(p, "w", encoding="utf-8") as f:
-            json.dump(self.settings, f, ensure_ascii=False, indent=2)
+        data = self.settings
+        if p == last_session_path():
+            # 会话文件只记与内置默认值不同的项；模板仍写完整设置，便于拷贝与手工编辑
+            data = settings_delta(self.settings, self._defaults)
+        if orjson is not None:
+            # orjson 直接输出 UTF-8 字节，中文不转义，与 ensure_ascii=False 一致
+            raw = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+        else:
+            raw = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+        # 先写临时文件再原子替换：自动保存中途失败或退出时不会留下半截的 JSON
+        tmp = p.with_name(p.name + ".tmp")
+        try:
+            tmp.write_bytes(raw)
+            tmp.replace(p)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            raise
 
     def _load_settings_json(self, p: Path):
-        with open(p, "r", encoding="utf-8") as f:
-            self.settings = json.load(f)
+        if orjson is not None:
+            data = orjson.loads(p.read_bytes())
+        else:
+            with open(p, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        # 以内置默认值为底合并：差异形式的会话文件与缺项的旧模板都能得到完整设置
+        self.settings = merge_settings(copy.deepcopy(self._defaults), data)
+        self._refresh_wm_key()
 
     def save_last_session(self):
         p = last_session_path()
         self._save_settings_json(p)
 
+    def _autosave(self):
+        try:
+            self.save_last_session()
+        except Exception:
+            pass
+
     def load_last_session(self):
         """
         启动时的加载策略：
@@ -1643,7 +2275,7 @@ class MainWindow(QMainWindow):
         self.combo_type.setCurrentIndex(0 if self.settings.get("watermark_type","text")=="text" else 1)
         # 文本
         self.edt_text.setText(self.settings.get("text",""))
-        self.font_combo.setCurrentFont(QFont(self.settings.get("font_family", QFont().family())))
+        self.font_combo.setCurrentFont(QFont(self.settings.get("font_family") or self._default_family))
         self.spin_font.setValue(int(self.settings.get("font_px", 128)))
         self.chk_bold.setChecked(bool(self.settings.get("bold", False)))
         self.chk_italic.setChecked(bool(self.settings.get("italic", False)))